@@ -1,8 +1,11 @@
 import os
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
+from services.metrics import instrument_engine, timed_pool
 
 load_dotenv()
 
@@ -12,32 +15,47 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME", "movielens")
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
 DATABASE_URL = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL, echo=False)
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
 
-SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+engine = create_engine(DATABASE_URL, echo=False, poolclass=timed_pool(QueuePool, "sync"), **POOL_OPTIONS)
+instrument_engine(engine, "sync")
 
-Base = declarative_base()
+session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Sessão por thread, usada pelas threads de fundo (treino, consumidor de eventos); requisições usam `get_db`.
+SessionLocal = scoped_session(session_factory)
 
-def check_and_create_tables():
-    try:
-        inspector = inspect(engine)
-        existing_tables = inspector.get_table_names()
-        required_tables = [table.__tablename__ for table in Base.__subclasses__()]
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, poolclass=timed_pool(AsyncAdaptedQueuePool, "async"), **POOL_OPTIONS)
+instrument_engine(async_engine.sync_engine, "async")
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
-        missing_tables = [table for table in required_tables if table not in existing_tables]
+Base = declarative_base()
 
-        if missing_tables:
-            print(f"📌 Criando tabelas ausentes: {missing_tables}")
-            Base.metadata.create_all(bind=engine)
-            print("✅ Todas as tabelas foram criadas com sucesso!")
-        else:
-            print("✔️ Todas as tabelas já existem. Nenhuma alteração necessária.")
 
+def check_and_create_tables():
+    """Cria as tabelas ausentes e aplica as migrações pendentes (ver app/migrations.py)."""
+    from app.migrations import upgrade
+
+    try:
+        upgrade(engine)
     except SQLAlchemyError as e:
-        print(f"❌ Erro ao verificar/criar tabelas: {str(e)}")
+        print(f"❌ Erro ao aplicar as migrações: {str(e)}")
 
 
 def test_database_connection():
@@ -56,7 +74,8 @@ def init_db():
 
 
 def get_db():
-    db = SessionLocal()
+    # Sessão própria por requisição: o FastAPI pode abrir e fechar a dependência em threads diferentes do pool.
+    db = session_factory()
     try:
         yield db
     except Exception as e:
@@ -66,5 +85,14 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
+
+
 if __name__ == "__main__":
     init_db()  # 🚀 Inicializa o banco ao rodar diretamente o script
@@ -0,0 +1,172 @@
+"""Migrações versionadas do esquema; app/models.py é a única definição das tabelas.
+
+Cada migração roda uma única vez, em ordem, e fica registrada em `schema_migrations`. Como o MySQL faz commit
+implícito em DDL, toda migração confere o estado do banco antes de alterar e pode ser repetida após uma falha.
+
+    python -m app.migrations            # aplica as pendentes
+    python -m app.migrations status     # lista aplicadas e pendentes
+"""
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, bindparam, func, inspect, select, text
+from sqlalchemy.schema import CreateColumn
+
+from app import models
+from app.database import Base, engine
+from services.genre_service import build_genre_bits, split_genres
+
+migrations_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migrations_metadata,
+    Column("version", String(32), primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(version: str, description: str):
+    def register(upgrade):
+        MIGRATIONS.append((version, description, upgrade))
+        return upgrade
+    return register
+
+
+def index_names(connection, table_name: str):
+    """Índices e restrições únicas existentes (o SQLite e o MySQL reportam UNIQUE em lugares diferentes)."""
+    inspector = inspect(connection)
+    names = {index["name"] for index in inspector.get_indexes(table_name)}
+    names.update(constraint["name"] for constraint in inspector.get_unique_constraints(table_name))
+    return names
+
+
+def add_missing_columns(connection, table: Table):
+    """ALTER TABLE ADD COLUMN para as colunas do modelo ausentes no banco; retorna os nomes adicionados."""
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    table_name = connection.dialect.identifier_preparer.format_table(table)
+    added = []
+    for column in table.columns:
+        if column.name not in existing:
+            print(f"   adicionando coluna {table.name}.{column.name}")
+            definition = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {definition}"))
+            added.append(column.name)
+    return added
+
+
+def backfill_genres(connection):
+    """Preenche genres, movie_genres e movies.genre_mask a partir de movies.genres (mesmos bits do ETL)."""
+    movies = connection.execute(select(models.Movie.id, models.Movie.genres)).all()
+    bits = build_genre_bits(genres for _, genres in movies)
+    if not bits:
+        return
+    connection.execute(models.Genre.__table__.insert(), [
+        {"id": bit + 1, "name": name, "bit": bit} for name, bit in bits.items()
+    ])
+
+    memberships, masks = [], []
+    for movie_id, genres in movies:
+        names = set(split_genres(genres))
+        memberships += [{"movie_id": movie_id, "genre_id": bits[name] + 1} for name in names]
+        masks.append({"b_id": movie_id, "b_mask": sum(1 << bits[name] for name in names)})
+    if memberships:
+        connection.execute(models.movie_genres.insert(), memberships)
+    table = models.Movie.__table__
+    connection.execute(table.update().where(table.c.id == bindparam("b_id")).values(genre_mask=bindparam("b_mask")), masks)
+
+
+def create_missing_indexes(connection, table: Table):
+    existing = index_names(connection, table.name)
+    for index in sorted(table.indexes, key=lambda index: index.name):
+        if index.name not in existing:
+            print(f"   criando índice {index.name}")
+            index.create(connection)
+
+
+@migration("0001", "esquema inicial a partir de app.models")
+def initial_schema(connection):
+    # checkfirst: só cria as tabelas ausentes; colunas novas em tabelas do ETL antigo ficam para a 0001.1.
+    Base.metadata.create_all(connection)
+
+
+@migration("0001.1", "agregados de avaliação e genre_mask em movies de bancos do ETL antigo")
+def legacy_movie_columns(connection):
+    added = add_missing_columns(connection, models.Movie.__table__)
+    if {"rating_count", "rating_sum", "avg_rating"} & set(added):
+        models.recompute_movie_stats(connection)
+    # Bancos do ETL antigo não tinham as tabelas de gêneros; a 0001 acabou de criá-las vazias.
+    if not connection.execute(select(func.count()).select_from(models.Genre.__table__)).scalar():
+        backfill_genres(connection)
+
+
+@migration("0002", "um voto por (user_id, movie_id) em ratings")
+def unique_votes(connection):
+    if "ux_ratings_user_movie" in index_names(connection, "ratings"):
+        return
+    duplicated = connection.execute(text(
+        "SELECT 1 FROM ratings GROUP BY user_id, movie_id HAVING COUNT(*) > 1 LIMIT 1"
+    )).first()
+    if duplicated:
+        # Mantém o voto mais recente de cada par; a tabela derivada contorna o erro 1093 do MySQL.
+        removed = connection.execute(text(
+            "DELETE FROM ratings WHERE id NOT IN ("
+            "SELECT id FROM (SELECT MAX(id) AS id FROM ratings GROUP BY user_id, movie_id) AS latest)"
+        )).rowcount
+        print(f"   {removed} votos duplicados removidos")
+        models.recompute_movie_stats(connection)
+    connection.execute(text("CREATE UNIQUE INDEX ux_ratings_user_movie ON ratings (user_id, movie_id)"))
+
+
+@migration("0003", "índices de cobertura para os acessos a ratings e movies")
+def covering_indexes(connection):
+    create_missing_indexes(connection, models.Rating.__table__)
+    create_missing_indexes(connection, models.Movie.__table__)
+
+
+@migration("0004", "users.token_version para revogar tokens na troca de senha")
+def user_token_version(connection):
+    add_missing_columns(connection, models.User.__table__)
+
+
+def applied_versions(connection):
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def upgrade(bind=engine):
+    """Aplica as migrações pendentes, cada uma na sua transação; retorna as versões aplicadas agora."""
+    migrations_metadata.create_all(bind)
+    with bind.connect() as connection:
+        done = applied_versions(connection)
+
+    applied = []
+    for version, description, apply in MIGRATIONS:
+        if version in done:
+            continue
+        print(f"📌 Migração {version}: {description}")
+        with bind.begin() as connection:
+            apply(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=version, description=description, applied_at=datetime.now(timezone.utc).replace(tzinfo=None),
+            ))
+        applied.append(version)
+
+    if not applied:
+        print("✔️ Esquema em dia. Nenhuma migração pendente.")
+    return applied
+
+
+def status(bind=engine):
+    migrations_metadata.create_all(bind)
+    with bind.connect() as connection:
+        done = dict(connection.execute(select(schema_migrations.c.version, schema_migrations.c.applied_at)).all())
+    for version, description, _ in MIGRATIONS:
+        state = f"aplicada em {done[version]:%Y-%m-%d %H:%M}" if version in done else "pendente"
+        print(f"{version}  {description:55} {state}")
+
+
+if __name__ == "__main__":
+    status() if sys.argv[1:] == ["status"] else upgrade()
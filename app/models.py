@@ -1,37 +1,84 @@
-from sqlalchemy import Column, Integer, String, DECIMAL, ForeignKey, DateTime, func, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, DECIMAL, ForeignKey, DateTime, func, Text, Table, Index, LargeBinary, UniqueConstraint, bindparam, select, tuple_
+from sqlalchemy.orm import relationship, column_property
 from app.database import Base, engine
 
+movie_genres = Table(
+    "movie_genres",
+    Base.metadata,
+    Column("movie_id", Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True),
+    Column("genre_id", Integer, ForeignKey("genres.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_movie_genres_genre_id_movie_id", "genre_id", "movie_id"),
+)
+
+class Genre(Base):
+    __tablename__ = "genres"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50), unique=True, nullable=False)
+    bit = Column(Integer, unique=True, nullable=False)
+
+    movies = relationship("Movie", secondary=movie_genres, back_populates="genre_list", lazy="select")
+
+    def __repr__(self):
+        return f"<Genre(id={self.id}, name={self.name}, bit={self.bit})>"
+
 class Movie(Base):
     __tablename__ = "movies"
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False, index=True)
     year = Column(Integer, nullable=True)
-    genres = Column(String(255), nullable=True)
+    genres = Column(String(255), nullable=False)
+    genre_mask = Column(BigInteger, nullable=False, default=0, server_default="0")
     image_base64 = Column(Text, nullable=True)
+    has_poster = column_property(image_base64.isnot(None))
 
-    ratings = relationship("Rating", back_populates="movie", cascade="all, delete-orphan", lazy="joined")
+    # 🔹 Agregados de avaliação materializados (mantidos pelo pipeline de votos via apply_rating_deltas e pelo ETL)
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(DECIMAL(12, 2), nullable=False, default=0, server_default="0")
+    avg_rating = Column(DECIMAL(3, 2), nullable=False, default=0, server_default="0")
 
-    def average_rating(self, session):
-        avg_rating = session.query(func.avg(Rating.rating)).filter(Rating.movie_id == self.id).scalar()
-        return round(avg_rating, 2) if avg_rating else 0.0
+    ratings = relationship("Rating", back_populates="movie", cascade="all, delete-orphan", lazy="select")
+    genre_list = relationship("Genre", secondary=movie_genres, back_populates="movies", lazy="select")
+
+    __table_args__ = (
+        Index("ix_movies_popularity", rating_count.desc(), avg_rating.desc(), id),
+    )
+
+    def average_rating(self):
+        return round(float(self.avg_rating), 2) if self.rating_count else 0.0
 
     def __repr__(self):
         return f"<Movie(id={self.id}, title={self.title}, year={self.year})>"
 
+class MovieImage(Base):
+    """Pôster já decodificado, em binário, por variante ("thumb" para grades, "full" para detalhes)."""
+    __tablename__ = "movie_images"
+
+    movie_id = Column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True)
+    variant = Column(String(16), primary_key=True)
+    media_type = Column(String(32), nullable=False)
+    byte_size = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    data = Column(LargeBinary(length=2**24 - 1), nullable=False)
+
+    def __repr__(self):
+        return f"<MovieImage(movie_id={self.movie_id}, variant={self.variant}, byte_size={self.byte_size})>"
+
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(255), unique=True, nullable=True)
     password_hash = Column(String(255), nullable=True)
+    # Incrementado a cada troca de senha; tokens emitidos com uma versão anterior deixam de valer.
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     gender = Column(String(10), nullable=False)
     age = Column(Integer, nullable=False)
     occupation = Column(Integer, nullable=False)
     zip_code = Column(String(20), nullable=False)
 
-    ratings = relationship("Rating", back_populates="user", cascade="all, delete-orphan", lazy="joined")
+    ratings = relationship("Rating", back_populates="user", cascade="all, delete-orphan", lazy="select")
 
     def __repr__(self):
         return f"<User(id={self.id}, username={self.username}, age={self.age}, gender={self.gender})>"
@@ -41,17 +88,95 @@ class Rating(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     movie_id = Column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     rating = Column(DECIMAL(3, 2), nullable=False)
     timestamp = Column(DateTime, nullable=False, default=func.now())
 
-    movie = relationship("Movie", back_populates="ratings", lazy="joined")
-    user = relationship("User", back_populates="ratings", lazy="joined")
+    movie = relationship("Movie", back_populates="ratings", lazy="select")
+    user = relationship("User", back_populates="ratings", lazy="select")
+
+    # Índices de cobertura dos acessos quentes (ver HOT_RATING_QUERIES e tests/test_query_plans.py).
+    __table_args__ = (
+        # Um voto por usuário e filme: o pipeline de votos grava com upsert nessa chave.
+        UniqueConstraint("user_id", "movie_id", name="ux_ratings_user_movie"),
+        # Filmes curtidos pelo usuário (WHERE user_id = ? AND rating = 5) lidos só do índice.
+        Index("ix_ratings_user_rating_movie", "user_id", "rating", "movie_id"),
+        # Último voto do usuário (WHERE user_id = ? ORDER BY id DESC LIMIT 1).
+        Index("ix_ratings_user_recent", "user_id", "id"),
+        # Agregados por filme (COUNT/SUM(rating) WHERE movie_id = ?, em recompute_movie_stats) sem ler a tabela.
+        Index("ix_ratings_movie_rating", "movie_id", "rating"),
+    )
 
     def __repr__(self):
         return f"<Rating(user_id={self.user_id}, movie_id={self.movie_id}, rating={self.rating})>"
 
+def apply_rating_deltas(session, deltas):
+    """Aplica {movie_id: (Δcount, Δsum)} aos agregados com um único executemany.
+
+    Um voto alterado entra só com Δsum (rating novo - antigo), sem contar de novo em rating_count.
+    """
+    if not deltas:
+        return
+    table = Movie.__table__
+    count = table.c.rating_count + bindparam("b_count")
+    total = table.c.rating_sum + bindparam("b_sum")
+    statement = (
+        table.update()
+        .where(table.c.id == bindparam("b_id"))
+        .ordered_values(
+            (table.c.avg_rating, total / func.nullif(count, 0)),
+            (table.c.rating_count, count),
+            (table.c.rating_sum, total),
+        )
+    )
+    session.connection().execute(statement, [
+        {"b_id": movie_id, "b_count": count_delta, "b_sum": sum_delta}
+        for movie_id, (count_delta, sum_delta) in deltas.items()
+    ])
+
+def movie_stats_update():
+    """UPDATE de rating_count e rating_sum por subconsultas correlacionadas (portável entre MySQL e SQLite)."""
+    ratings = Rating.__table__
+    movies = Movie.__table__
+    per_movie = ratings.c.movie_id == movies.c.id
+    return movies.update().values(
+        rating_count=select(func.count()).where(per_movie).scalar_subquery(),
+        rating_sum=select(func.coalesce(func.sum(ratings.c.rating), 0)).where(per_movie).scalar_subquery(),
+    )
+
+def recompute_movie_stats(connection):
+    """Recalcula rating_count, rating_sum e avg_rating de todos os filmes a partir de ratings."""
+    movies = Movie.__table__
+    connection.execute(movie_stats_update())
+    connection.execute(movies.update().values(
+        avg_rating=func.coalesce(movies.c.rating_sum / func.nullif(movies.c.rating_count, 0), 0),
+    ))
+
+def liked_movies_query(user_id: int):
+    return select(Rating.movie_id).where(Rating.user_id == user_id, Rating.rating == 5)
+
+def last_rated_movie_query(user_id: int):
+    return select(Rating.movie_id).where(Rating.user_id == user_id).order_by(Rating.id.desc()).limit(1)
+
+def existing_votes_query(pairs):
+    pairs = list(pairs)
+    # O IN por user_id dá ao otimizador um prefixo de índice; só o IN de tuplas vira scan no SQLite.
+    return select(Rating.user_id, Rating.movie_id, Rating.rating).where(
+        Rating.user_id.in_({user_id for user_id, _ in pairs}),
+        tuple_(Rating.user_id, Rating.movie_id).in_(pairs),
+    )
+
+# Consultas quentes sobre ratings, com parâmetros de exemplo; os testes de plano falham se alguma virar full scan.
+HOT_RATING_QUERIES = {
+    "liked_movies": lambda: liked_movies_query(1),
+    "last_rated_movie": lambda: last_rated_movie_query(1),
+    "existing_votes": lambda: existing_votes_query([(1, 1), (2, 3)]),
+    "movie_stats": movie_stats_update,
+}
+
 if __name__ == "__main__":
-    print("Criando tabelas no banco de dados...")
-    Base.metadata.create_all(bind=engine)
+    from app.migrations import upgrade
+
+    print("Aplicando migrações no banco de dados...")
+    upgrade(engine)
     print("Banco de dados atualizado com sucesso!")
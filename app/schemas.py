@@ -13,6 +13,8 @@ class MovieCreate(MovieBase):
 class MovieResponse(MovieBase):
     id: int
     rating: Optional[float] = Field(None, ge=0.0, le=5.0)
+    poster_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
     image_base64: Optional[str] = None
 
     class Config:
@@ -56,10 +58,18 @@ class RatingResponse(RatingBase):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class MovieStatsResponse(BaseModel):
     total_movies: int
     total_ratings: int
     average_rating: Optional[float] = None
     top_genres: List[str]
+
+class BatchRecommendationRequest(BaseModel):
+    user_ids: List[int] = Field(..., min_length=1, max_length=1000)
+    n: int = Field(5, ge=1, le=100)
@@ -0,0 +1,55 @@
+"""Tempo e memória da leitura dos arquivos do MovieLens: parser Python do pandas vs. stream "::" no engine C.
+
+Uso (um diretório extraído por tamanho de dataset):
+
+    python -m benchmarks.etl_bench data/movielens ~/datasets/ml-10M100K ~/datasets/ml-20m
+"""
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from services.movielens_reader import ENCODING, detect_layout, read_movielens
+
+
+def legacy_read(directory: str):
+    """Caminho antigo de etl.extract_data: engine="python" e conversão de timestamp linha a linha."""
+    layout, paths = detect_layout(directory)
+    if layout != "dat":
+        return None
+    movies = pd.read_csv(paths["movies"], delimiter="::", names=["id", "title", "genres"], engine="python", encoding=ENCODING)
+    if paths["users"]:
+        pd.read_csv(paths["users"], delimiter="::", names=["id", "gender", "age", "occupation", "zip_code"], engine="python", encoding=ENCODING)
+    ratings = pd.read_csv(paths["ratings"], delimiter="::", names=["user_id", "movie_id", "rating", "timestamp"], engine="python", encoding=ENCODING)
+    ratings["timestamp"] = ratings["timestamp"].astype(int).apply(lambda x: datetime.fromtimestamp(x, timezone.utc))
+    return movies, ratings
+
+
+def measure(fn, directory):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(directory)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+def run(directories):
+    print(f"{'dataset':35} {'avaliações':>12} {'antigo':>18} {'novo':>18} {'ganho':>7}")
+    for directory in directories:
+        (_, _, ratings), new_time, new_peak = measure(read_movielens, directory)
+        legacy, old_time, old_peak = measure(legacy_read, directory)
+
+        new = f"{new_time:>7.2f}s {new_peak:>7.0f}MiB"
+        if legacy is None:
+            print(f"{directory:35} {len(ratings):>12} {'(layout CSV)':>18} {new:>18}")
+            continue
+        old = f"{old_time:>7.2f}s {old_peak:>7.0f}MiB"
+        print(f"{directory:35} {len(ratings):>12} {old:>18} {new:>18} {old_time / new_time:>6.1f}x")
+
+
+if __name__ == "__main__":
+    run(sys.argv[1:] or ["data/movielens"])
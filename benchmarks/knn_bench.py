@@ -0,0 +1,114 @@
+"""Memória e latência do kNN usuário-usuário: pivot denso do pandas vs. engine CSR.
+
+Uso:
+
+    python -m benchmarks.knn_bench                      # avaliações do banco (ML-1M)
+    python -m benchmarks.knn_bench --synthetic 10000000 # conjunto sintético
+    python -m benchmarks.knn_bench --synthetic 10000000 --skip-legacy
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from sklearn.neighbors import NearestNeighbors
+
+from services.knn_service import UserKNNEngine
+
+
+def load_from_db():
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rows = db.query(models.Rating.user_id, models.Rating.movie_id, models.Rating.rating).order_by(models.Rating.id).all()
+    finally:
+        db.close()
+    data = np.array(rows, dtype=np.float64)
+    return data[:, 0].astype(np.int64), data[:, 1].astype(np.int64), data[:, 2].astype(np.float32)
+
+
+def synthetic(n_ratings: int, seed: int = 42):
+    """Avaliações com popularidade de cauda longa (Zipf) e atividade de usuários log-normal."""
+    rng = np.random.default_rng(seed)
+    n_users = max(int(n_ratings / 165), 10)
+    n_movies = max(int(n_users * 0.6), 10)
+    activity = rng.lognormal(mean=0, sigma=1, size=n_users)
+    user_ids = rng.choice(n_users, size=n_ratings, p=activity / activity.sum()) + 1
+    popularity = 1 / np.arange(1, n_movies + 1) ** 0.9
+    movie_ids = rng.choice(n_movies, size=n_ratings, p=popularity / popularity.sum()) + 1
+    ratings = rng.integers(1, 6, size=n_ratings).astype(np.float32)
+    return user_ids, movie_ids, ratings
+
+
+class LegacyKNN:
+    """Caminho antigo de routers/movies_routes: pivot denso + NearestNeighbors por cosseno."""
+
+    def __init__(self, user_ids, movie_ids, ratings):
+        df = pd.DataFrame({"user_id": user_ids, "movie_id": movie_ids, "rating": ratings})
+        df = df.drop_duplicates(["user_id", "movie_id"], keep="last")
+        self.matrix = df.pivot(index="user_id", columns="movie_id", values="rating").fillna(0).astype(np.float32)
+        self.model = NearestNeighbors(metric="cosine", algorithm="brute").fit(csr_matrix(self.matrix))
+
+    def recommend(self, user_id, liked):
+        user_index = list(self.matrix.index).index(user_id)
+        _, indices = self.model.kneighbors([self.matrix.iloc[user_index]], n_neighbors=5)
+        similar_users = self.matrix.iloc[indices[0][1:]].mean()
+        return [m for m in similar_users.sort_values(ascending=False).index.tolist() if m not in liked][:5]
+
+
+def _measure(label, build, recommend, sample_users, liked_by_user):
+    tracemalloc.start()
+    start = time.perf_counter()
+    engine = build()
+    build_seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = []
+    for user_id in sample_users:
+        start = time.perf_counter()
+        recommend(engine, user_id, liked_by_user.get(user_id, set()))
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    print(
+        f"{label:8} build {build_seconds:8.2f}s  pico {peak / 2**20:9.1f} MiB  "
+        f"p50 {statistics.median(latencies):8.2f}ms  p99 {latencies[int(len(latencies) * 0.99) - 1]:8.2f}ms"
+    )
+    return engine
+
+
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--synthetic", type=int, default=0, help="Número de avaliações sintéticas (0 = usar o banco).")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    user_ids, movie_ids, ratings = synthetic(args.synthetic) if args.synthetic else load_from_db()
+    print(f"{len(ratings)} avaliações, {len(np.unique(user_ids))} usuários, {len(np.unique(movie_ids))} filmes")
+
+    rng = np.random.default_rng(0)
+    sample_users = rng.choice(np.unique(user_ids), size=args.requests).tolist()
+    liked_mask = ratings == 5
+    liked_by_user = {}
+    for user_id, movie_id in zip(user_ids[liked_mask].tolist(), movie_ids[liked_mask].tolist()):
+        liked_by_user.setdefault(user_id, set()).add(movie_id)
+
+    def build_engine():
+        engine = UserKNNEngine()
+        engine.load_arrays(user_ids, movie_ids, ratings)
+        return engine
+
+    _measure("csr", build_engine, lambda e, u, liked: e.recommend(u, liked), sample_users, liked_by_user)
+    if not args.skip_legacy:
+        _measure("pandas", lambda: LegacyKNN(user_ids, movie_ids, ratings), lambda e, u, liked: e.recommend(u, liked), sample_users, liked_by_user)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,81 @@
+"""Teste de carga: latência p50/p99 e vazão dos endpoints de leitura sob concorrência.
+
+Compara dois servidores rodando lado a lado, por exemplo a versão síncrona (antes) e a assíncrona (depois):
+
+    uvicorn main:app --port 8001 --workers 1   # checkout anterior
+    uvicorn main:app --port 8000 --workers 1   # checkout atual
+    python -m benchmarks.load_bench --baseline http://localhost:8001 --candidate http://localhost:8000
+
+Sem `--baseline`, mede apenas o servidor candidato.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+ENDPOINTS = [
+    ("/movies/", {"limit": 20}),
+    ("/movies/", {"title": "star", "limit": 20}),
+    ("/movies/1", {}),
+    ("/movies/popular-movies/", {"limit": 10}),
+]
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def _worker(client, path, params, deadline, samples, errors):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, params=params)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        samples.append((time.perf_counter() - start) * 1000)
+
+
+async def measure(base_url: str, path: str, params, concurrency: int, seconds: float):
+    samples, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        await client.get(path, params=params)  # aquecimento
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(_worker(client, path, params, deadline, samples, errors) for _ in range(concurrency)))
+    return samples, errors
+
+
+def _row(label, samples, errors, seconds):
+    if not samples:
+        return f"{label:10} {'(sem respostas)':>10} erros={len(errors)}"
+    return (
+        f"{label:10} p50={statistics.median(samples):>8.2f}ms p99={percentile(samples, 0.99):>8.2f}ms "
+        f"req/s={len(samples) / seconds:>8.1f} erros={len(errors)}"
+    )
+
+
+async def run(candidate: str, baseline: str = None, concurrency: int = 64, seconds: float = 10):
+    targets = [("antes", baseline), ("depois", candidate)] if baseline else [("atual", candidate)]
+    print(f"concorrência={concurrency} duração={seconds}s por endpoint")
+    for path, params in ENDPOINTS:
+        print(f"\n{path} {params}")
+        for label, base_url in targets:
+            samples, errors = await measure(base_url, path, params, concurrency, seconds)
+            print(_row(label, samples, errors, seconds))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidate", default="http://localhost:8000")
+    parser.add_argument("--baseline")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.candidate, args.baseline, args.concurrency, args.seconds))
@@ -0,0 +1,93 @@
+"""Conta statements SQL, linhas e objetos ORM carregados por endpoint.
+
+Uso (com o banco populado pelo ETL):
+
+    python -m benchmarks.orm_load_counts
+
+Falha com código de saída 1 se algum endpoint ultrapassar o orçamento,
+evitando que um eager loading acidental volte sem ser percebido. Também falha se
+um endpoint que consulta o banco não registrar nenhum statement: sinal de que a
+contagem deixou de enxergar o engine usado pela rota.
+"""
+import sys
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app import models
+from app.database import Base, SessionLocal, async_engine, engine
+from main import app
+
+ADMIN_USERNAME = "admin"
+ADMIN_PASSWORD = "admin"
+
+_counters = {"statements": 0, "rows": 0, "objects": 0}
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    _counters["statements"] += 1
+    if cursor.rowcount and cursor.rowcount > 0:
+        _counters["rows"] += cursor.rowcount
+
+
+# As rotas de leitura usam o engine assíncrono; os eventos de cursor dele ficam no sync_engine interno.
+for _engine in (engine, async_engine.sync_engine):
+    event.listen(_engine, "after_cursor_execute", _count_statement)
+
+
+@event.listens_for(Base, "load", propagate=True)
+def _count_object(target, context):
+    _counters["objects"] += 1
+
+
+def _reset():
+    for key in _counters:
+        _counters[key] = 0
+
+
+def _most_rated_movie_id():
+    session = SessionLocal()
+    try:
+        return session.query(models.Movie.id).order_by(models.Movie.rating_count.desc()).limit(1).scalar()
+    finally:
+        session.close()
+
+
+def build_cases(client):
+    movie_id = _most_rated_movie_id()
+    login = client.post("/users/login", json={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+    headers = {"Authorization": f"Bearer {login.json().get('access_token')}"} if login.status_code == 200 else {}
+
+    # (nome, método, caminho, kwargs, orçamento máximo de objetos ORM, statements mínimos e máximos)
+    # /users/me pode não consultar o banco: o principal do token vem do cache preenchido no login.
+    return [
+        ("GET /movies/?limit=100", "get", "/movies/?limit=100", {}, 100, 1, 2),
+        ("GET /movies/{id}", "get", f"/movies/{movie_id}", {}, 1, 1, 2),
+        ("GET /movies/popular-movies/?limit=50", "get", "/movies/popular-movies/?limit=50", {}, 50, 1, 2),
+        ("GET /users/me", "get", "/users/me", {"headers": headers}, 1, 0, 2),
+    ]
+
+
+def run():
+    client = TestClient(app)
+    failures = []
+
+    print(f"{'endpoint':45} {'status':>6} {'stmts':>6} {'rows':>8} {'objects':>8}")
+    for name, method, path, kwargs, max_objects, min_statements, max_statements in build_cases(client):
+        _reset()
+        response = getattr(client, method)(path, **kwargs)
+        print(f"{name:45} {response.status_code:>6} {_counters['statements']:>6} {_counters['rows']:>8} {_counters['objects']:>8}")
+
+        if _counters["objects"] > max_objects or not min_statements <= _counters["statements"] <= max_statements:
+            failures.append(name)
+
+    if failures:
+        print(f"❌ Orçamento de carregamento excedido em: {', '.join(failures)}")
+        return 1
+
+    print("✅ Todos os endpoints dentro do orçamento de carregamento.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,59 @@
+"""Latência da página 1 vs. página N com offset e com cursor (keyset).
+
+Uso (com o banco populado pelo ETL):
+
+    python -m benchmarks.pagination_bench [página] [limit] [repetições]
+"""
+import statistics
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services.pagination import NEXT_CURSOR_HEADER
+
+ENDPOINTS = ["/movies/", "/movies/popular-movies/"]
+
+
+def _cursor_for_page(client, path, page, limit):
+    """Percorre as páginas anteriores para obter o cursor que leva à página pedida."""
+    cursor = None
+    for _ in range(page - 1):
+        params = {"limit": limit, **({"after": cursor} if cursor else {})}
+        response = client.get(path, params=params)
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if response.status_code != 200 or cursor is None:
+            return None
+    return cursor
+
+
+def _median_ms(client, path, params, repetitions):
+    samples = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        client.get(path, params=params)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(page: int = 500, limit: int = 5, repetitions: int = 20):
+    client = TestClient(app)
+
+    print(f"{'endpoint':25} {'pág. 1':>10} {f'offset pág. {page}':>18} {f'cursor pág. {page}':>18}")
+    for path in ENDPOINTS:
+        first = _median_ms(client, path, {"limit": limit}, repetitions)
+        deep_offset = _median_ms(client, path, {"limit": limit, "offset": (page - 1) * limit}, repetitions)
+
+        cursor = _cursor_for_page(client, path, page, limit)
+        if cursor is None:
+            print(f"{path:25} {first:>8.2f}ms {deep_offset:>16.2f}ms {'(sem dados)':>18}")
+            continue
+
+        deep_cursor = _median_ms(client, path, {"limit": limit, "after": cursor}, repetitions)
+        print(f"{path:25} {first:>8.2f}ms {deep_offset:>16.2f}ms {deep_cursor:>16.2f}ms")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:4]]
+    run(*args)
@@ -0,0 +1,73 @@
+"""Compara a busca antiga por ILIKE com o índice invertido em memória.
+
+Uso (com o ML-1M carregado pelo ETL):
+
+    python -m benchmarks.search_bench [repetições]
+"""
+import statistics
+import sys
+import time
+
+from app import models
+from app.database import SessionLocal
+from services.search_service import MovieSearchIndex
+
+QUERIES = [
+    {"title": "star"},
+    {"title": "star wars"},
+    {"title": "lov"},
+    {"title": "the"},
+    {"title": "godfather part"},
+    {"genres": "Comedy"},
+    {"genres": "Action|Sci-Fi"},
+    {"title": "man", "genres": "Drama"},
+]
+LIMIT = 20
+
+
+def ilike_search(db, title=None, genres=None):
+    query = db.query(models.Movie.id)
+    if title:
+        query = query.filter(models.Movie.title.ilike(f"%{title}%"))
+    if genres:
+        query = query.filter(models.Movie.genres.ilike(f"%{genres}%"))
+    return [row.id for row in query.limit(LIMIT).all()]
+
+
+def index_search(db, index, title=None, genres=None):
+    page_ids = index.search(title=title, genres=genres)[:LIMIT]
+    if not page_ids:
+        return []
+    return [row.id for row in db.query(models.Movie.id).filter(models.Movie.id.in_(page_ids)).all()]
+
+
+def _timed(fn, repetitions):
+    samples = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def run(repetitions: int = 50):
+    db = SessionLocal()
+    try:
+        index = MovieSearchIndex()
+        start = time.perf_counter()
+        index.build(db)
+        print(f"Construção do índice: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        print(f"{'consulta':40} {'ilike p50':>10} {'ilike p95':>10} {'index p50':>10} {'index p95':>10}")
+        for params in QUERIES:
+            ilike_p50, ilike_p95 = _timed(lambda: ilike_search(db, **params), repetitions)
+            index_p50, index_p95 = _timed(lambda: index_search(db, index, **params), repetitions)
+            label = ", ".join(f"{k}={v}" for k, v in params.items())
+            print(f"{label:40} {ilike_p50:>9.2f}ms {ilike_p95:>9.2f}ms {index_p50:>9.2f}ms {index_p95:>9.2f}ms")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,319 @@
+"""Suíte de benchmarks ponta a ponta: dataset sintético, carga num banco local e todas as rotas da API.
+
+Para cada rota registra vazão, p50/p95/p99, erros e a memória do processo da API (lida em /metrics), e compara
+com uma linha de base salva antes. Use um banco só para benchmark, já que a suíte vota e cadastra usuários:
+
+    DB_NAME=movielens_bench python -m benchmarks.suite prepare --ratings 1M
+    DB_NAME=movielens_bench uvicorn main:app --port 8000 --workers 1
+    python -m benchmarks.suite run --ratings 1M --save-baseline benchmarks/baseline-1m.json
+    # ... aplica a mudança e reinicia a API ...
+    python -m benchmarks.suite run --ratings 1M --baseline benchmarks/baseline-1m.json
+
+`run` termina com código 1 se alguma rota piorar mais que `--tolerance` na vazão ou no p95.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.load_bench import percentile
+from benchmarks.synthetic_dataset import dataset_shape, generate, parse_size
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "synthetic")
+BENCH_PASSWORD = "bench-password"
+_MEMORY_LINE = re.compile(r'^flix_process_memory_bytes\{kind="(\w+)"\} (\S+)$', re.MULTILINE)
+
+
+class BenchContext:
+    """Estado compartilhado pelos cenários: tamanho do dataset, RNG e tokens do usuário de benchmark."""
+
+    def __init__(self, n_users: int, n_movies: int, seed: int = 0):
+        self.n_users = n_users
+        self.n_movies = n_movies
+        self.rng = random.Random(seed)
+        self.run_id = f"{int(time.time())}-{os.getpid()}"
+        self.access_token = None
+        self.refresh_token = None
+        self._registered = 0
+
+    def user_id(self) -> int:
+        return self.rng.randint(1, self.n_users)
+
+    def movie_id(self) -> int:
+        return self.rng.randint(1, self.n_movies)
+
+    def vote(self):
+        return {"user_id": self.user_id(), "movie_id": self.movie_id()}
+
+    def new_user(self):
+        self._registered += 1
+        return {"username": f"bench-{self.run_id}-{self._registered}", "password": BENCH_PASSWORD}
+
+    def auth_headers(self):
+        return {"Authorization": f"Bearer {self.access_token}"}
+
+
+class Scenario:
+    """Uma rota com parâmetros sorteados a cada requisição.
+
+    `path`, `params` e `body` podem ser funções de BenchContext. Respostas 429 (backpressure do bcrypt ou dos
+    votos) são contadas à parte; status fora de `expected` contam como erro.
+    """
+
+    def __init__(self, name, method, path, params=None, body=None, auth=False, expected=(200,),
+                 concurrency=None, max_requests=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.params = params
+        self.body = body
+        self.auth = auth
+        self.expected = expected
+        self.concurrency = concurrency
+        self.max_requests = max_requests
+
+    def request(self, ctx: BenchContext):
+        resolve = lambda value: value(ctx) if callable(value) else value
+        return {
+            "method": self.method,
+            "url": resolve(self.path),
+            "params": resolve(self.params),
+            "json": resolve(self.body),
+            "headers": ctx.auth_headers() if self.auth else None,
+        }
+
+
+SCENARIOS = [
+    # routers/movies_routes.py
+    Scenario("movies.list", "GET", "/movies/", {"limit": 20}),
+    Scenario("movies.search", "GET", "/movies/", lambda ctx: {"title": f"movie {ctx.movie_id()}", "limit": 20}, expected=(200, 404)),
+    Scenario("movies.by_genre", "GET", "/movies/", lambda ctx: {"genres": ctx.rng.choice(["Drama", "Comedy", "Sci-Fi"]), "limit": 20}),
+    Scenario("movies.detail", "GET", lambda ctx: f"/movies/{ctx.movie_id()}"),
+    Scenario("movies.poster", "GET", lambda ctx: f"/movies/{ctx.movie_id()}/poster", {"size": "thumb"}, expected=(200, 404)),
+    Scenario("movies.popular", "GET", "/movies/popular-movies/", {"limit": 10}),
+    Scenario("movies.popular_rebuild", "POST", "/movies/popular-movies/rebuild", auth=True, concurrency=1, max_requests=5),
+    Scenario("movies.like", "POST", "/movies/like/", body=lambda ctx: ctx.vote()),
+    Scenario("movies.like_queued", "POST", "/movies/like/", {"ack": "queued"}, body=lambda ctx: ctx.vote(), expected=(202,)),
+    Scenario("movies.dislike", "POST", "/movies/dislike/", body=lambda ctx: ctx.vote()),
+    Scenario("movies.votes_status", "GET", "/movies/votes/status"),
+    Scenario("movies.recommend_knn", "GET", lambda ctx: f"/movies/recommend/{ctx.user_id()}"),
+    # routers/auth_routes.py
+    Scenario("users.register", "POST", "/users/register", body=lambda ctx: ctx.new_user(), expected=(201,)),
+    Scenario("users.login", "POST", "/users/login", body=lambda ctx: {"username": f"bench-{ctx.run_id}-0", "password": BENCH_PASSWORD}),
+    Scenario("users.refresh", "POST", "/users/refresh", body=lambda ctx: {"refresh_token": ctx.refresh_token}),
+    Scenario("users.me", "GET", "/users/me", auth=True),
+    Scenario("users.update_me", "PATCH", "/users/me", body={}, auth=True),
+    # routers/recommend_routes.py
+    Scenario("recommend.model_status", "GET", "/recommend/model"),
+    Scenario("recommend.knn_status", "GET", "/recommend/knn"),
+    Scenario("recommend.cache_status", "GET", "/recommend/cache"),
+    Scenario("recommend.similar", "GET", lambda ctx: f"/recommend/{ctx.movie_id()}", expected=(200, 404)),
+    Scenario("recommend.user_svd", "GET", lambda ctx: f"/recommend/user/{ctx.user_id()}", expected=(200, 400, 404, 503)),
+    Scenario("recommend.users_batch", "POST", "/recommend/users/batch",
+             body=lambda ctx: {"user_ids": [ctx.user_id() for _ in range(50)], "n": 5}, expected=(200, 503)),
+    Scenario("recommend.retrain", "POST", "/recommend/model/retrain", auth=True, expected=(202,), concurrency=1, max_requests=1),
+    Scenario("metrics", "GET", "/metrics"),
+]
+
+
+async def _worker(client, scenario, ctx, deadline, budget, samples, statuses):
+    while time.perf_counter() < deadline and budget[0] > 0:
+        budget[0] -= 1
+        started = time.perf_counter()
+        try:
+            response = await client.request(**scenario.request(ctx))
+            code = response.status_code
+        except httpx.HTTPError as e:
+            code = type(e).__name__
+        statuses[code] = statuses.get(code, 0) + 1
+        if code in scenario.expected:
+            samples.append((time.perf_counter() - started) * 1000)
+
+
+async def server_memory(client):
+    response = await client.get("/metrics")
+    if response.status_code != 200:
+        return {}
+    return {kind: float(value) / 2**20 for kind, value in _MEMORY_LINE.findall(response.text)}
+
+
+async def run_scenario(client, scenario, ctx, concurrency: int, seconds: float):
+    await client.request(**scenario.request(ctx))  # aquecimento (constrói índices e caches preguiçosos)
+    samples, statuses = [], {}
+    budget = [scenario.max_requests or float("inf")]
+    workers = scenario.concurrency or concurrency
+    started = time.perf_counter()
+    deadline = started + seconds
+    await asyncio.gather(*(_worker(client, scenario, ctx, deadline, budget, samples, statuses) for _ in range(workers)))
+    elapsed = time.perf_counter() - started
+    memory = await server_memory(client)
+
+    errors = sum(count for code, count in statuses.items() if code not in scenario.expected and code != 429)
+    return {
+        "requests": sum(statuses.values()),
+        "throughput": round(len(samples) / elapsed, 2),
+        "p50_ms": round(statistics.median(samples), 3) if samples else None,
+        "p95_ms": round(percentile(samples, 0.95), 3) if samples else None,
+        "p99_ms": round(percentile(samples, 0.99), 3) if samples else None,
+        "errors": errors,
+        "throttled": statuses.get(429, 0),
+        "statuses": {str(code): count for code, count in sorted(statuses.items(), key=str)},
+        "rss_mb": round(memory.get("resident", 0), 1),
+    }
+
+
+async def authenticate(client, ctx: BenchContext):
+    """Cadastra o usuário fixo do benchmark (bench-<run>-0) e guarda os tokens dele."""
+    credentials = {"username": f"bench-{ctx.run_id}-0", "password": BENCH_PASSWORD}
+    await client.post("/users/register", json=credentials)
+    response = await client.post("/users/login", json=credentials)
+    response.raise_for_status()
+    tokens = response.json()
+    ctx.access_token, ctx.refresh_token = tokens["access_token"], tokens.get("refresh_token")
+
+
+async def run_suite(base_url: str, n_ratings: int, concurrency: int, seconds: float, only=None):
+    n_users, n_movies = dataset_shape(n_ratings)
+    ctx = BenchContext(n_users, n_movies)
+    scenarios = [scenario for scenario in SCENARIOS if not only or any(scenario.name.startswith(prefix) for prefix in only)]
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await authenticate(client, ctx)
+        baseline_memory = await server_memory(client)
+        results = {}
+        print(f"{'cenário':28} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'erros':>6} {'429':>5} {'RSS':>8}")
+        for scenario in scenarios:
+            result = results[scenario.name] = await run_scenario(client, scenario, ctx, concurrency, seconds)
+            print(_row(scenario.name, result))
+        final_memory = await server_memory(client)
+
+    return {
+        "meta": {
+            "base_url": base_url,
+            "ratings": n_ratings,
+            "users": n_users,
+            "movies": n_movies,
+            "concurrency": concurrency,
+            "seconds": seconds,
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "rss_mb_start": round(baseline_memory.get("resident", 0), 1),
+            "rss_mb_peak": round(final_memory.get("peak_resident", 0), 1),
+        },
+        "scenarios": results,
+    }
+
+
+def _ms(value):
+    return f"{value:>7.1f}ms" if value is not None else f"{'-':>9}"
+
+
+def _row(name, result):
+    return (
+        f"{name:28} {result['throughput']:>9.1f} {_ms(result['p50_ms'])} {_ms(result['p95_ms'])} {_ms(result['p99_ms'])} "
+        f"{result['errors']:>6} {result['throttled']:>5} {result['rss_mb']:>6.0f}MB"
+    )
+
+
+def _change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before
+
+
+def compare(baseline, current, tolerance: float):
+    """Imprime a diferença por cenário; retorna os cenários que pioraram além da tolerância."""
+    regressions = []
+    print(f"\n{'cenário':28} {'req/s antes→depois':>24} {'p95 antes→depois':>26} {'RSS':>16}")
+    for name, after in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            print(f"{name:28} (sem linha de base)")
+            continue
+        throughput = _change(before["throughput"], after["throughput"])
+        p95 = _change(before["p95_ms"], after["p95_ms"])
+        worse = (throughput is not None and throughput < -tolerance) or (p95 is not None and p95 > tolerance)
+        if worse:
+            regressions.append(name)
+        print(
+            f"{name:28} {before['throughput']:>9.1f}→{after['throughput']:<9.1f}{_pct(throughput)} "
+            f"{_ms(before['p95_ms'])}→{_ms(after['p95_ms'])}{_pct(p95)} "
+            f"{before['rss_mb']:>6.0f}→{after['rss_mb']:<6.0f}MB{' ⚠️' if worse else ''}"
+        )
+    print(f"\nPico de RSS: {baseline['meta']['rss_mb_peak']:.0f}MB → {current['meta']['rss_mb_peak']:.0f}MB")
+    return regressions
+
+
+def _pct(change):
+    return f" ({change:+.0%})" if change is not None else "      "
+
+
+def prepare(n_ratings: int, directory: str = None, seed: int = 42):
+    """Gera o dataset (se ainda não existir) e o carrega no banco configurado por DB_* via ETL."""
+    import etl
+    from app.database import engine
+    from app.migrations import upgrade
+
+    directory = directory or os.path.join(DATA_DIR, f"{n_ratings}")
+    if not os.path.exists(os.path.join(directory, "ratings.dat")):
+        generate(n_ratings, directory, seed)
+
+    etl.create_database()
+    upgrade(engine)
+    started = time.perf_counter()
+    data = etl.extract_data(directory)
+    if etl.load_data_to_db(data):
+        etl.backfill_movie_stats()
+    print(f"✅ Banco pronto em {time.perf_counter() - started:.1f}s.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    prepare_parser = commands.add_parser("prepare", help="gera o dataset sintético e carrega no banco local")
+    prepare_parser.add_argument("--ratings", type=parse_size, default="1M")
+    prepare_parser.add_argument("--directory")
+    prepare_parser.add_argument("--seed", type=int, default=42)
+
+    run_parser = commands.add_parser("run", help="roda os cenários contra a API e compara com a linha de base")
+    run_parser.add_argument("--ratings", type=parse_size, default="1M", help="tamanho usado no prepare")
+    run_parser.add_argument("--base-url", default="http://localhost:8000")
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--seconds", type=float, default=10)
+    run_parser.add_argument("--only", nargs="*", help="prefixos de cenários (ex.: movies. users.login)")
+    run_parser.add_argument("--output", help="salva o resultado desta execução em JSON")
+    run_parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    run_parser.add_argument("--save-baseline", help="salva esta execução como linha de base")
+    run_parser.add_argument("--tolerance", type=float, default=0.10)
+
+    args = parser.parse_args(argv)
+    if args.command == "prepare":
+        prepare(args.ratings, args.directory, args.seed)
+        return 0
+
+    result = asyncio.run(run_suite(args.base_url, args.ratings, args.concurrency, args.seconds, args.only))
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as file:
+            json.dump(result, file, indent=2)
+        print(f"💾 Resultado salvo em {path}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(json.load(file), result, args.tolerance)
+        if regressions:
+            print(f"⚠️ Regressões acima de {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Gera um dataset sintético no formato do MovieLens ("::"), pronto para `etl.extract_data`/`read_movielens`.
+
+Popularidade dos filmes em cauda longa (Zipf), atividade dos usuários log-normal (mínimo de 20 avaliações,
+como no ML-1M), notas com a distribuição do ML-1M e pares (usuário, filme) únicos.
+
+    python -m benchmarks.synthetic_dataset 1M data/synthetic/1m
+    python -m benchmarks.synthetic_dataset 25M data/synthetic/25m --seed 7
+"""
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+
+from services.movielens_reader import ENCODING
+
+GENRES = [
+    "Action", "Adventure", "Animation", "Children's", "Comedy", "Crime", "Documentary", "Drama", "Fantasy",
+    "Film-Noir", "Horror", "Musical", "Mystery", "Romance", "Sci-Fi", "Thriller", "War", "Western",
+]
+RATING_VALUES = np.array([1, 2, 3, 4, 5], dtype=np.int8)
+RATING_SHARE = np.array([0.056, 0.108, 0.261, 0.349, 0.226])
+USER_AGES = np.array([1, 18, 25, 35, 45, 50, 56], dtype=np.int8)
+MIN_RATINGS_PER_USER = 20
+MAX_CATALOG_SHARE = 0.3
+MIN_DATASET_RATINGS = 1_000
+# Janela de tempo do ML-1M (abr/2000 a fev/2003).
+FIRST_TIMESTAMP, LAST_TIMESTAMP = 956_703_932, 1_046_454_590
+WRITE_CHUNK = 1_000_000
+
+
+def parse_size(value: str) -> int:
+    """Aceita "1M", "10M", "250K" ou um número."""
+    multipliers = {"K": 1_000, "M": 1_000_000}
+    value = value.strip().upper()
+    if value[-1] in multipliers:
+        return int(float(value[:-1]) * multipliers[value[-1]])
+    return int(value)
+
+
+def dataset_shape(n_ratings: int):
+    """Usuários e filmes proporcionais ao ML-1M (~165 avaliações por usuário), com o catálogo crescendo sublinear.
+
+    Em datasets pequenos o catálogo cresce até caber `n_ratings` com 50% de folga, já que cada usuário
+    avalia no máximo 30% dos filmes.
+    """
+    if n_ratings < MIN_DATASET_RATINGS:
+        raise ValueError(f"Use pelo menos {MIN_DATASET_RATINGS} avaliações (pedido: {n_ratings}).")
+    n_users = max(int(n_ratings / 165), 10)
+    n_movies = max(int(3_700 * (n_ratings / 1_000_000) ** 0.75), 50)
+    n_movies = max(n_movies, math.ceil(n_ratings * 1.5 / (n_users * MAX_CATALOG_SHARE)))
+    return n_users, n_movies
+
+
+def user_activity(rng, n_users: int, n_ratings: int, n_movies: int):
+    """Avaliações por usuário: log-normal, entre 20 e 30% do catálogo, somando `n_ratings`."""
+    cap = max(int(n_movies * MAX_CATALOG_SHARE), MIN_RATINGS_PER_USER)
+    weights = rng.lognormal(mean=0, sigma=1, size=n_users)
+    counts = np.clip(np.floor(weights / weights.sum() * n_ratings), MIN_RATINGS_PER_USER, cap).astype(np.int64)
+    # Ajusta o total distribuindo a diferença entre quem ainda tem espaço.
+    while counts.sum() != n_ratings:
+        diff = n_ratings - counts.sum()
+        room = np.flatnonzero(counts < cap) if diff > 0 else np.flatnonzero(counts > MIN_RATINGS_PER_USER)
+        if not len(room):
+            raise ValueError(f"{n_ratings} avaliações não cabem em {n_users} usuários x {n_movies} filmes.")
+        picked = rng.choice(room, size=min(abs(diff), len(room)), replace=False)
+        counts[picked] += 1 if diff > 0 else -1
+    return counts
+
+
+def sample_ratings(rng, counts, n_movies: int, zipf_exponent: float = 0.9, oversample: float = 1.5):
+    """Pares (usuário, filme) únicos: sorteia pela popularidade com folga e corta cada usuário na sua cota.
+
+    Duplicatas são descartadas e as cotas ainda abertas são completadas em novas rodadas.
+    """
+    popularity = 1 / np.arange(1, n_movies + 1) ** zipf_exponent
+    popularity /= popularity.sum()
+    # Ids embaralhados: o filme 1 não é sempre o mais popular (e cortar por id não enviesa a popularidade).
+    movie_order = rng.permutation(n_movies).astype(np.int64) + 1
+    all_users = np.arange(1, len(counts) + 1, dtype=np.int64)
+
+    keys = np.empty(0, dtype=np.int64)
+    missing = counts.copy()
+    while missing.sum():
+        users = np.repeat(all_users, np.ceil(missing * oversample).astype(np.int64))
+        movies = movie_order[rng.choice(n_movies, size=len(users), p=popularity)]
+        keys = np.concatenate([keys, users * (n_movies + 1) + movies])
+        keys.sort()
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+
+        user_ids = keys // (n_movies + 1)
+        rank = np.arange(len(keys)) - np.searchsorted(user_ids, user_ids)
+        keys = keys[rank < counts[user_ids - 1]]
+        missing = counts - np.bincount(keys // (n_movies + 1) - 1, minlength=len(counts))
+    return keys // (n_movies + 1), keys % (n_movies + 1)
+
+
+def write_movies(rng, path: str, n_movies: int):
+    years = rng.integers(1919, 2001, size=n_movies)
+    n_genres = rng.choice([1, 2, 3], size=n_movies, p=[0.5, 0.35, 0.15])
+    with open(path, "w", encoding=ENCODING, newline="\n") as file:
+        for movie_id in range(1, n_movies + 1):
+            genres = "|".join(sorted(rng.choice(GENRES, size=n_genres[movie_id - 1], replace=False)))
+            file.write(f"{movie_id}::Synthetic Movie {movie_id} ({years[movie_id - 1]})::{genres}\n")
+
+
+def write_users(rng, path: str, n_users: int):
+    genders = rng.choice(["M", "F"], size=n_users, p=[0.72, 0.28])
+    ages = rng.choice(USER_AGES, size=n_users)
+    occupations = rng.integers(0, 21, size=n_users)
+    zip_codes = rng.integers(0, 100_000, size=n_users)
+    with open(path, "w", encoding=ENCODING, newline="\n") as file:
+        for row in range(n_users):
+            file.write(f"{row + 1}::{genders[row]}::{ages[row]}::{occupations[row]}::{zip_codes[row]:05d}\n")
+
+
+def write_ratings(rng, path: str, user_ids, movie_ids):
+    ratings = rng.choice(RATING_VALUES, size=len(user_ids), p=RATING_SHARE)
+    timestamps = rng.integers(FIRST_TIMESTAMP, LAST_TIMESTAMP, size=len(user_ids))
+    # Como no ML-1M: agrupado por usuário, em ordem cronológica.
+    order = np.lexsort((timestamps, user_ids))
+    columns = np.column_stack([user_ids[order], movie_ids[order], ratings[order], timestamps[order]])
+    with open(path, "w", encoding=ENCODING, newline="\n") as file:
+        for start in range(0, len(columns), WRITE_CHUNK):
+            chunk = columns[start:start + WRITE_CHUNK]
+            file.write(("%d::%d::%d::%d\n" * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
+def generate(n_ratings: int, directory: str, seed: int = 42):
+    """Escreve movies.dat, users.dat e ratings.dat em `directory`; retorna (usuários, filmes, avaliações)."""
+    rng = np.random.default_rng(seed)
+    n_users, n_movies = dataset_shape(n_ratings)
+    os.makedirs(directory, exist_ok=True)
+
+    started = time.perf_counter()
+    counts = user_activity(rng, n_users, n_ratings, n_movies)
+    user_ids, movie_ids = sample_ratings(rng, counts, n_movies)
+    write_movies(rng, os.path.join(directory, "movies.dat"), n_movies)
+    write_users(rng, os.path.join(directory, "users.dat"), n_users)
+    write_ratings(rng, os.path.join(directory, "ratings.dat"), user_ids, movie_ids)
+
+    print(f"✅ {len(user_ids)} avaliações, {n_users} usuários e {n_movies} filmes em {directory} "
+          f"({time.perf_counter() - started:.1f}s).")
+    return n_users, n_movies, len(user_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("ratings", type=parse_size, help="número de avaliações: 1M, 10M, 25M...")
+    parser.add_argument("directory")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if args.ratings < MIN_DATASET_RATINGS:
+        parser.error(f"use pelo menos {MIN_DATASET_RATINGS} avaliações")
+    generate(args.ratings, args.directory, args.seed)
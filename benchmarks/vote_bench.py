@@ -0,0 +1,86 @@
+"""Teste de carga dos votos: votos/s sustentados e latência p50/p99 de POST /movies/like/ e /movies/dislike/.
+
+Cada worker vota em pares (usuário, filme) aleatórios, com uma fração de repetições para exercitar o upsert.
+Compara a gravação síncrona (antes) com o pipeline em lote (depois):
+
+    uvicorn main:app --port 8001 --workers 1   # checkout anterior
+    uvicorn main:app --port 8000 --workers 1   # checkout atual
+    python -m benchmarks.vote_bench --baseline http://localhost:8001 --candidate http://localhost:8000 --ack committed
+    python -m benchmarks.vote_bench --candidate http://localhost:8000 --ack queued
+
+Os usuários e filmes (ids 1..N) precisam existir no banco, como após o ETL do ML-1M.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+from benchmarks.load_bench import percentile
+
+
+async def _worker(client, ack, users, movies, deadline, samples, errors, rng):
+    params = {"ack": ack} if ack else {}
+    while time.perf_counter() < deadline:
+        path = "/movies/like/" if rng.random() < 0.8 else "/movies/dislike/"
+        payload = {"user_id": rng.randint(1, users), "movie_id": rng.randint(1, movies)}
+        start = time.perf_counter()
+        try:
+            response = await client.post(path, params=params, json=payload)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        samples.append((time.perf_counter() - start) * 1000)
+
+
+async def measure(base_url: str, ack, concurrency: int, seconds: float, users: int, movies: int, seed: int = 0):
+    samples, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(
+            _worker(client, ack, users, movies, deadline, samples, errors, random.Random(seed + worker))
+            for worker in range(concurrency)
+        ))
+        status = await client.get("/movies/votes/status")
+    return samples, errors, status.json() if status.status_code == 200 else None
+
+
+def _row(label, samples, errors, seconds, status):
+    if not samples:
+        return f"{label:10} {'(sem respostas)':>10} erros={len(errors)}"
+    row = (
+        f"{label:10} votos/s={len(samples) / seconds:>8.1f} p50={statistics.median(samples):>8.2f}ms "
+        f"p99={percentile(samples, 0.99):>8.2f}ms erros={len(errors)}"
+    )
+    if status:
+        row += f" lote médio={status['avg_batch_size']} pendentes={status['pending']}"
+    return row
+
+
+async def run(candidate: str, baseline: str = None, ack: str = "committed", concurrency: int = 64,
+              seconds: float = 10, users: int = 6040, movies: int = 3952):
+    # O servidor anterior não conhece o parâmetro `ack`; ele só é enviado ao candidato.
+    targets = [("antes", baseline, None), ("depois", candidate, ack)] if baseline else [("atual", candidate, ack)]
+    print(f"concorrência={concurrency} duração={seconds}s ack={ack} usuários={users} filmes={movies}")
+    for label, base_url, target_ack in targets:
+        samples, errors, status = await measure(base_url, target_ack, concurrency, seconds, users, movies)
+        print(_row(label, samples, errors, seconds, status))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidate", default="http://localhost:8000")
+    parser.add_argument("--baseline")
+    parser.add_argument("--ack", choices=["committed", "queued"], default="committed")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--users", type=int, default=6040)
+    parser.add_argument("--movies", type=int, default=3952)
+    args = parser.parse_args()
+    asyncio.run(run(args.candidate, args.baseline, args.ack, args.concurrency, args.seconds, args.users, args.movies))
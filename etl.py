@@ -1,15 +1,25 @@
+import hashlib
+import json
 import os
+import time
 import requests
 import zipfile
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+import numpy as np
 import pandas as pd
 import mysql.connector
-from sqlalchemy import create_engine, Column, Integer, String, DECIMAL, ForeignKey, DateTime, Text
-from sqlalchemy.orm import relationship, sessionmaker, DeclarativeBase
-from datetime import datetime
+from sqlalchemy import select
 from passlib.context import CryptContext
 from dotenv import load_dotenv
-from datetime import datetime, timezone
+from app.database import engine, session_factory
+from app.migrations import upgrade
+from app.models import Genre, Movie, MovieImage, Rating, User, movie_genres, recompute_movie_stats
+from services.genre_service import build_genre_bits
+from services.bulk_loader import ChunkedLoader
+from services.image_service import decode_poster, poster_variants
+from services.movielens_reader import read_movielens
 
 load_dotenv()
 
@@ -26,15 +36,16 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 MOVIELENS_DIR = os.path.join(DATA_DIR, "movielens")
 IMAGES_DIR = os.path.join(DATA_DIR, "images")
 IMAGES_CSV_PATH = os.path.join(IMAGES_DIR, "ml1m-images-master", "ml1m_images.csv")
+DATASET_ZIP_PATH = os.path.join(DATA_DIR, "ml-1m.zip")
+IMAGES_ZIP_PATH = os.path.join(DATA_DIR, "ml1m-images.zip")
+MANIFEST_PATH = os.path.join(DATA_DIR, "etl_manifest.json")
 
 DATASET_URL = os.getenv("DATASET_URL")
 IMAGES_ZIP_URL = os.getenv("IMAGES_ZIP_URL")
-
-if os.path.exists(DATA_DIR):
-    shutil.rmtree(DATA_DIR)
-
-os.makedirs(MOVIELENS_DIR, exist_ok=True)
-os.makedirs(IMAGES_DIR, exist_ok=True)
+DATASET_SHA256 = os.getenv("DATASET_SHA256")
+IMAGES_ZIP_SHA256 = os.getenv("IMAGES_ZIP_SHA256")
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+IMAGES_CHUNK_ROWS = 1000
 
 def create_database():
     conn = mysql.connector.connect(
@@ -46,50 +57,8 @@ def create_database():
     conn.close()
     print(f"Banco de dados `{DB_CONFIG['database']}` pronto.")
 
-create_database()
-
-DATABASE_URL = f"mysql+mysqlconnector://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
-engine = create_engine(DATABASE_URL, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-class Base(DeclarativeBase):
-    pass
-
-class Movie(Base):
-    __tablename__ = "movies"
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String(255), nullable=False)
-    year = Column(Integer, nullable=True)
-    genres = Column(String(255), nullable=False)
-    image_base64 = Column(Text, nullable=True)
-    ratings = relationship("Rating", back_populates="movie", cascade="all, delete")
-
-class User(Base):
-    __tablename__ = "users"
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    username = Column(String(255), unique=True, nullable=True)
-    password_hash = Column(String(255), nullable=True)
-    gender = Column(String(10), nullable=False)
-    age = Column(Integer, nullable=False)
-    occupation = Column(Integer, nullable=False)
-    zip_code = Column(String(20), nullable=False)
-    ratings = relationship("Rating", back_populates="user", cascade="all, delete")
-
-class Rating(Base):
-    __tablename__ = "ratings"
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    movie_id = Column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), nullable=False)
-    rating = Column(DECIMAL(3, 2), nullable=False)
-    timestamp = Column(DateTime, nullable=False)
-
-    movie = relationship("Movie", back_populates="ratings")
-    user = relationship("User", back_populates="ratings")
-
-Base.metadata.create_all(bind=engine)
-
 def create_admin_user():
-    session = SessionLocal()
+    session = session_factory()
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
     admin_user = session.query(User).filter(User.username == "admin").first()
@@ -103,102 +72,364 @@ def create_admin_user():
 
     session.close()
 
-create_admin_user()
 
-def download_file(url, save_path):
-    if not os.path.exists(save_path):
-        print(f"Baixando {url}...")
-        response = requests.get(url, verify=False, stream=True)
-        with open(save_path, "wb") as file:
-            file.write(response.content)
-        print(f"Download concluído: {save_path}")
+def sha256_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EtlManifest:
+    """Estado persistido entre execuções: hash dos arquivos baixados, etapas concluídas e linhas por tabela.
+
+    O hash de cada arquivo é reaproveitado enquanto tamanho e mtime não mudarem, para que um boot com
+    tudo em dia não precise reler os zips.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.state = {"files": {}, "stages": {}, "tables": {}}
+        if os.path.exists(path):
+            try:
+                with open(path) as file:
+                    self.state.update(json.load(file))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Manifesto do ETL ilegível, recomeçando do zero: {e}")
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        cached = self.state["files"].get(os.path.basename(path))
+        if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime:
+            return cached["sha256"]
+        return self.record_file(path, sha256_file(path))
+
+    def record_file(self, path, digest):
+        """Registra um hash já calculado (ex.: durante o download), evitando reler o arquivo."""
+        stat = os.stat(path)
+        self.state["files"][os.path.basename(path)] = {"sha256": digest, "size": stat.st_size, "mtime": stat.st_mtime}
+        return digest
+
+    def stage_done(self, stage, fingerprint):
+        return self.state["stages"].get(stage) == fingerprint
+
+    def mark_stage(self, stage, fingerprint):
+        self.state["stages"][stage] = fingerprint
+        self.save()
+
+    def tables_loaded(self, counts):
+        """O banco tem pelo menos as linhas do dataset (a API só acrescenta); menos que isso indica banco zerado."""
+        expected = self.state["tables"]
+        return bool(expected) and all(counts.get(table, 0) >= rows for table, rows in expected.items())
+
+    def save(self):
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(self.state, file, indent=2)
+        os.replace(temporary, self.path)
+
+class ChecksumMismatch(ValueError):
+    pass
 
-def extract_zip(zip_path, extract_to):
-    if not os.path.exists(extract_to) or not os.listdir(extract_to):
-        print(f"Extraindo para {extract_to}...")
-        with zipfile.ZipFile(zip_path, "r") as zip_ref:
-            zip_ref.extractall(extract_to)
 
-        extracted_subdir = os.path.join(extract_to, "ml-1m")
-        if os.path.exists(extracted_subdir):
+def print_download_progress(save_path, downloaded, total):
+    if total:
+        print(f"   {os.path.basename(save_path)}: {downloaded / 2**20:.1f}/{total / 2**20:.1f} MiB ({downloaded / total:.0%})")
+    else:
+        print(f"   {os.path.basename(save_path)}: {downloaded / 2**20:.1f} MiB")
+
+
+def _stream_to_file(chunks, file, digest, save_path, downloaded, total, on_progress):
+    reported = 0
+    for chunk in chunks:
+        file.write(chunk)
+        digest.update(chunk)
+        downloaded += len(chunk)
+        # Um aviso a cada ~10%: os dois downloads rodam em paralelo e dividem o terminal.
+        if on_progress and (downloaded - reported >= (total or 0) / 10 or downloaded == total):
+            on_progress(save_path, downloaded, total)
+            reported = downloaded
+    return downloaded
+
+
+def download_file(url, save_path, expected_sha256=None, on_progress=print_download_progress):
+    """Baixa `url` em stream para `save_path` e retorna o SHA-256 do conteúdo.
+
+    O download vai para `save_path + ".part"` e é retomado com HTTP Range se uma execução anterior parou
+    no meio. URLs `file://` (ou caminhos locais) são copiadas, o que permite rodar o ETL offline contra
+    um espelho local. Com `expected_sha256`, um arquivo divergente é descartado e `ChecksumMismatch` é levantada.
+    """
+    partial_path = f"{save_path}.part"
+    digest = hashlib.sha256()
+    parsed = urlparse(url)
+    print(f"Baixando {url}...")
+
+    if parsed.scheme in ("", "file"):
+        source = unquote(parsed.path) if parsed.scheme == "file" else url
+        with open(source, "rb") as reader, open(partial_path, "wb") as file:
+            chunks = iter(lambda: reader.read(DOWNLOAD_CHUNK_SIZE), b"")
+            _stream_to_file(chunks, file, digest, save_path, 0, os.path.getsize(source), on_progress)
+    else:
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with requests.get(url, verify=False, stream=True, headers=headers, timeout=60) as response:
+            if response.status_code == 416:
+                # O .part já tem o arquivo inteiro; só falta conferir.
+                total = offset
+                chunks = []
+            else:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    offset = 0  # servidor ignorou o Range: recomeça do zero
+                content_length = response.headers.get("Content-Length")
+                total = offset + int(content_length) if content_length else None
+                chunks = response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+
+            if offset:
+                print(f"   Retomando a partir de {offset / 2**20:.1f} MiB.")
+                with open(partial_path, "rb") as existing:
+                    for chunk in iter(lambda: existing.read(DOWNLOAD_CHUNK_SIZE), b""):
+                        digest.update(chunk)
+
+            with open(partial_path, "ab" if offset else "wb") as file:
+                _stream_to_file(chunks, file, digest, save_path, offset, total, on_progress)
+
+    sha256 = digest.hexdigest()
+    if expected_sha256 and sha256 != expected_sha256.lower():
+        os.remove(partial_path)
+        raise ChecksumMismatch(f"SHA-256 de {url} não confere: esperado {expected_sha256}, obtido {sha256}.")
+
+    os.replace(partial_path, save_path)
+    print(f"Download concluído: {save_path}")
+    return sha256
+
+
+def fetch_archive(manifest, url, save_path, expected_sha256=None):
+    """Garante o arquivo local verificado; retorna seu SHA-256 (reaproveitando o manifesto quando possível)."""
+    if os.path.exists(save_path):
+        sha256 = manifest.file_hash(save_path)
+        if not expected_sha256 or sha256 == expected_sha256.lower():
+            return sha256
+        print(f"⚠️ {os.path.basename(save_path)} não confere com o SHA-256 esperado; baixando novamente.")
+        os.remove(save_path)
+
+    sha256 = download_file(url, save_path, expected_sha256)
+    return manifest.record_file(save_path, sha256)
+
+def extract_zip(zip_path, extract_to):
+    """Extrai o zip em um diretório limpo (o conteúdo de uma versão anterior do arquivo é descartado)."""
+    print(f"Extraindo para {extract_to}...")
+    if os.path.exists(extract_to):
+        shutil.rmtree(extract_to)
+    os.makedirs(extract_to)
+
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        zip_ref.extractall(extract_to)
+
+    # ml-1m/, ml-10M100K/, ml-20m/...: achata a subpasta do dataset.
+    for subdir in os.listdir(extract_to):
+        extracted_subdir = os.path.join(extract_to, subdir)
+        if subdir.startswith("ml-") and os.path.isdir(extracted_subdir):
             for file in os.listdir(extracted_subdir):
                 shutil.move(os.path.join(extracted_subdir, file), os.path.join(extract_to, file))
             shutil.rmtree(extracted_subdir)
             print("Arquivos movidos e subpasta removida.")
 
-        print("Extração concluída.")
+    print("Extração concluída.")
 
 
-def extract_data():
-    movies_path = os.path.join(MOVIELENS_DIR, "movies.dat")
-    users_path = os.path.join(MOVIELENS_DIR, "users.dat")
-    ratings_path = os.path.join(MOVIELENS_DIR, "ratings.dat")
+def extract_data(directory=MOVIELENS_DIR):
+    movies, users, ratings = read_movielens(directory)
 
-    if not os.path.exists(movies_path):
-        raise FileNotFoundError(f"ERRO: Arquivo `{movies_path}` não encontrado!")
-
-    movies = pd.read_csv(movies_path, delimiter="::", names=["id", "title", "genres"], engine="python", encoding="ISO-8859-1")
-    movies["id"] = movies["id"].astype(int)
-    movies["year"] = movies["title"].str.extract(r"\((\d{4})\)").fillna(0).astype(int)
+    movies["year"] = movies["title"].str.extract(r"\((\d{4})\)", expand=False).fillna(0).astype(np.int32)
     movies["title"] = movies["title"].str.replace(r"\(\d{4}\)", "", regex=True).str.strip()
 
-    users = pd.read_csv(users_path, delimiter="::", names=["id", "gender", "age", "occupation", "zip_code"], engine="python", encoding="ISO-8859-1")
-    users.drop(columns=["id"], inplace=True)
     users["username"] = None
     users["password_hash"] = None
 
-    ratings = pd.read_csv(ratings_path, delimiter="::", names=["user_id", "movie_id", "rating", "timestamp"], engine="python", encoding="ISO-8859-1")
-    ratings["timestamp"] = ratings["timestamp"].astype(int).apply(lambda x: datetime.fromtimestamp(x, timezone.utc))
-
     return {"movies": movies, "users": users, "ratings": ratings}
 
-def load_data_to_db(data):
-    session = SessionLocal()
-    print("Inserindo dados no banco...")
+def build_genre_tables(movies):
+    bits = build_genre_bits(movies["genres"].fillna(""))
+    genres = pd.DataFrame({"name": list(bits.keys()), "bit": list(bits.values())})
+    genres["id"] = genres["bit"] + 1
 
-    session.bulk_insert_mappings(Movie, data["movies"].to_dict(orient="records"))
-    session.bulk_insert_mappings(User, data["users"].to_dict(orient="records"))
-    session.bulk_insert_mappings(Rating, data["ratings"].to_dict(orient="records"))
+    exploded = movies[["id"]].assign(genre=movies["genres"].fillna("").str.split("|")).explode("genre")
+    exploded = exploded[exploded["genre"].str.len() > 0].drop_duplicates()
+    exploded["bit"] = exploded["genre"].map(bits).astype(np.int64)
 
-    session.commit()
-    session.close()
-    print("Dados inseridos.")
+    masks = pd.Series(np.left_shift(np.int64(1), exploded["bit"].to_numpy()), index=exploded["id"]).groupby(level=0).sum()
+    movies["genre_mask"] = movies["id"].map(masks).fillna(0).astype(np.int64)
+
+    movie_genres_df = pd.DataFrame({"movie_id": exploded["id"], "genre_id": exploded["bit"] + 1})
+    return genres, movie_genres_df
+
+def print_load_progress(table_name, loaded, total):
+    print(f"   {table_name}: {loaded}/{total} ({loaded / total:.0%})", end="\r" if loaded < total else "\n")
 
 
-def insert_image_to_db():
-    session = SessionLocal()
+LOADED_TABLES = (Genre.__table__, Movie.__table__, movie_genres, User.__table__, Rating.__table__)
+
+
+def table_counts(loader):
+    return {table.name: loader.count(table) for table in LOADED_TABLES}
+
+
+def full_load_pending(loader, table):
+    """Tabela vazia ou com uma carga completa interrompida (progresso gravado)."""
+    return loader.rows_loaded(table.name) > 0 or loader.count(table) == 0
+
+
+def new_ratings(ratings):
+    """Avaliações do dataset cujo par (usuário, filme) ainda não está no banco.
+
+    Pares existentes não são sobrescritos: votos feitos pela API depois da carga são mais recentes.
+    """
+    with engine.connect() as conn:
+        existing = pd.read_sql(select(Rating.user_id, Rating.movie_id), conn)
+    merged = ratings.merge(existing.drop_duplicates(), on=["user_id", "movie_id"], how="left", indicator=True)
+    return ratings[(merged["_merge"] == "left_only").to_numpy()]
+
+
+def load_data_to_db(data, loader=None):
+    """Sincroniza o dataset com o banco; retorna quantas avaliações foram inseridas.
+
+    Tabelas vazias recebem a carga completa (em blocos, retomável); nas demais, filmes, gêneros e usuários
+    são atualizados por upsert e só as avaliações novas são inseridas. Pode ser repetido com segurança.
+    """
+    loader = loader or ChunkedLoader(engine, on_progress=print_load_progress)
+    print("Inserindo dados no banco...")
+
+    genres, movie_genres_df = build_genre_tables(data["movies"])
+    incremental = [
+        (Genre.__table__, genres, ["id"], ["name", "bit"]),
+        (Movie.__table__, data["movies"], ["id"], ["title", "year", "genres", "genre_mask"]),
+        (movie_genres, movie_genres_df, ["movie_id", "genre_id"], []),
+        (User.__table__, data["users"], ["id"], ["gender", "age", "occupation", "zip_code"]),
+    ]
+    for table, frame, keys, update_columns in incremental:
+        if full_load_pending(loader, table):
+            loader.load(table, frame)
+            loader.reset(table.name)
+        else:
+            loader.upsert(table, frame, keys, update_columns)
+
+    ratings_table = Rating.__table__
+    if full_load_pending(loader, ratings_table):
+        inserted = loader.load(ratings_table, data["ratings"])
+        loader.reset(ratings_table.name)
+    else:
+        inserted = loader.append(ratings_table, new_ratings(data["ratings"]))
+
+    print("Dados inseridos.")
+    return inserted
+
+
+def backfill_movie_stats():
+    print("Calculando agregados de avaliação dos filmes...")
+    with engine.begin() as conn:
+        recompute_movie_stats(conn)
+    print("Agregados calculados.")
+
+
+def image_variant_rows(chunk):
+    """Decodifica cada base64 uma única vez e gera as linhas de movie_images (miniatura e completa)."""
+    rows = []
+    for movie_id, image_base64 in zip(chunk["id"], chunk["image_base64"]):
+        try:
+            poster = decode_poster(image_base64)
+        except ValueError as e:
+            print(f"⚠️ Pôster do filme {movie_id} ignorado: {e}")
+            continue
+        for variant, stored in poster_variants(poster):
+            rows.append({
+                "movie_id": int(movie_id),
+                "variant": variant,
+                "media_type": stored.media_type,
+                "byte_size": len(stored.data),
+                "sha256": stored.etag.strip('"'),
+                "data": stored.data,
+            })
+    return pd.DataFrame(rows)
+
+
+def insert_image_to_db(loader=None):
+    """Grava os pôsteres em lote: UPDATE por executemany em movies e upsert das variantes binárias."""
+    loader = loader or ChunkedLoader(engine)
     if not os.path.exists(IMAGES_CSV_PATH):
         print("❌ ERRO: Arquivo ml1m_images.csv não encontrado!")
         return
 
-    images_df = pd.read_csv(IMAGES_CSV_PATH, encoding="ISO-8859-1")
-    image_dict = dict(zip(images_df["item_id"], images_df["image"]))
+    with engine.connect() as conn:
+        movie_ids = set(conn.execute(select(Movie.id)).scalars())
 
-    existing_movies = session.query(Movie).filter(Movie.id.in_(image_dict.keys())).all()
+    updated = stored_bytes = 0
+    chunks = pd.read_csv(IMAGES_CSV_PATH, encoding="ISO-8859-1", usecols=["item_id", "image"], chunksize=IMAGES_CHUNK_ROWS)
+    for chunk in chunks:
+        chunk = chunk.rename(columns={"item_id": "id", "image": "image_base64"})
+        chunk = chunk[chunk["id"].isin(movie_ids) & chunk["image_base64"].notna()]
+        if chunk.empty:
+            continue
 
-    for movie in existing_movies:
-        movie.image_base64 = image_dict.get(movie.id)
+        # image_base64 continua preenchido para quem ainda pede include_image=true.
+        loader.update(Movie.__table__, chunk, ["id"], ["image_base64"])
+        variants = image_variant_rows(chunk)
+        if not variants.empty:
+            loader.upsert(MovieImage.__table__, variants, ["movie_id", "variant"], ["media_type", "byte_size", "sha256", "data"])
+            stored_bytes += int(variants["byte_size"].sum())
+        updated += len(chunk)
 
-    session.commit()
-    session.close()
-    print(f"✅ {len(existing_movies)} filmes atualizados com imagens.")
+    print(f"✅ {updated} filmes atualizados com imagens ({stored_bytes / 2**20:.1f} MiB em movie_images).")
 
 
 
 def run_etl():
+    """Executa as etapas pendentes; as que já foram concluídas para o mesmo conteúdo são puladas."""
     print("Iniciando ETL...")
+    started = time.perf_counter()
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+    create_database()
+    upgrade(engine)
+    manifest = EtlManifest()
+    loader = ChunkedLoader(engine, on_progress=print_load_progress)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        dataset_download = pool.submit(fetch_archive, manifest, DATASET_URL, DATASET_ZIP_PATH, DATASET_SHA256)
+        images_download = pool.submit(fetch_archive, manifest, IMAGES_ZIP_URL, IMAGES_ZIP_PATH, IMAGES_ZIP_SHA256)
+        dataset_hash = dataset_download.result()
+        images_hash = images_download.result()
+    manifest.save()
+
+    for stage, zip_path, extract_to, fingerprint in (
+        ("extract_dataset", DATASET_ZIP_PATH, MOVIELENS_DIR, dataset_hash),
+        ("extract_images", IMAGES_ZIP_PATH, IMAGES_DIR, images_hash),
+    ):
+        if manifest.stage_done(stage, fingerprint) and os.path.isdir(extract_to) and os.listdir(extract_to):
+            print(f"⏭️ {os.path.basename(zip_path)} inalterado; extração ignorada.")
+        else:
+            extract_zip(zip_path, extract_to)
+            manifest.mark_stage(stage, fingerprint)
+
+    needs_load = not (manifest.stage_done("load", dataset_hash) and manifest.tables_loaded(table_counts(loader)))
+    if needs_load:
+        data = extract_data()
+        if load_data_to_db(data, loader):
+            backfill_movie_stats()
+        manifest.state["tables"] = {name: len(data[name]) for name in ("movies", "users", "ratings")}
+        manifest.mark_stage("load", dataset_hash)
+    else:
+        print("⏭️ Dataset inalterado e já carregado; carga ignorada.")
 
-    download_file(DATASET_URL, os.path.join(DATA_DIR, "ml-1m.zip"))
-    download_file(IMAGES_ZIP_URL, os.path.join(DATA_DIR, "ml1m-images.zip"))
-
-    extract_zip(os.path.join(DATA_DIR, "ml-1m.zip"), MOVIELENS_DIR)
-    extract_zip(os.path.join(DATA_DIR, "ml1m-images.zip"), IMAGES_DIR)
+    if needs_load or not manifest.stage_done("images", images_hash):
+        insert_image_to_db()
+        manifest.mark_stage("images", images_hash)
+    else:
+        print("⏭️ Pôsteres inalterados; etapa de imagens ignorada.")
 
-    data = extract_data()
-    load_data_to_db(data)
-    insert_image_to_db()
     create_admin_user()
-    print("ETL finalizado.")
+    print(f"ETL finalizado em {time.perf_counter() - started:.1f}s.")
 
 if __name__ == "__main__":
     run_etl()
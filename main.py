@@ -1,10 +1,61 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware  # 🔹 Importar CORS Middleware
 from fastapi.openapi.utils import get_openapi
 import uvicorn
+from sqlalchemy.exc import SQLAlchemyError
 
+from app.database import SessionLocal, async_engine
 from routers.auth_routes import auth_router
+from routers.metrics_routes import metrics_router
 from routers.movies_routes import  router
+from routers.recommend_routes import recommender_router
+from services.auth_service import password_hasher
+from services.metrics import RequestMetricsMiddleware
+from services.pagination import NEXT_CURSOR_HEADER
+from services.popularity_service import popularity_ranking
+from services.rating_events import rating_event_consumer
+from services.recommend_service import collaborative_registry
+from services.search_service import movie_search_index
+from services.similarity_service import movie_similarity_index
+from services.vote_pipeline import vote_pipeline
+
+SYNC_THREADPOOL_SIZE = int(os.getenv("SYNC_THREADPOOL_SIZE", "40"))
+
+
+def warm_indexes():
+    """Aquece os índices em memória antes de aceitar requisições."""
+    db = SessionLocal()
+    try:
+        movie_search_index.build(db)
+        popularity_ranking.rebuild(db)
+        movie_similarity_index.refresh_if_changed(db)
+    except SQLAlchemyError as e:
+        print(f"⚠️ Índices em memória não construídos na inicialização: {e}")
+    finally:
+        db.close()
+        SessionLocal.remove()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Handlers síncronos restantes (recomendações, rebuilds) rodam nesse pool de threads do AnyIO.
+    to_thread.current_default_thread_limiter().total_tokens = SYNC_THREADPOOL_SIZE
+    await asyncio.to_thread(warm_indexes)
+    password_hasher.start()
+
+    collaborative_registry.start()
+    rating_event_consumer.start()
+    vote_pipeline.start()
+    yield
+    vote_pipeline.stop()
+    rating_event_consumer.stop()
+    collaborative_registry.stop()
+    password_hasher.shutdown()
+    await async_engine.dispose()
 
 
 def create_application() -> FastAPI:
@@ -15,7 +66,8 @@ def create_application() -> FastAPI:
         version="1.0.0",
         docs_url="/docs",
         redoc_url="/redoc",
-        openapi_url="/openapi.json"
+        openapi_url="/openapi.json",
+        lifespan=lifespan,
     )
 
     app.add_middleware(
@@ -24,9 +76,14 @@ def create_application() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],  
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER],
     )
+    # Adicionado por último para ficar mais externo e medir a requisição inteira.
+    app.add_middleware(RequestMetricsMiddleware)
     app.include_router(auth_router)  
     app.include_router(router)
+    app.include_router(recommender_router)
+    app.include_router(metrics_router)
 
     return app
 
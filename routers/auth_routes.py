@@ -1,56 +1,83 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from datetime import datetime, timedelta
-from jose import jwt, JWTError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+from jose import JWTError
 from fastapi.security import OAuth2PasswordBearer
 
 from app import models, database
-from app.schemas import UserCreate, UserLogin, UserResponse, Token
-
-SECRET_KEY = "supersecretkey"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.schemas import UserCreate, UserLogin, UserResponse, UserUpdate, Token, RefreshRequest
+from services.auth_service import (
+    Principal,
+    PasswordHasherBusy,
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    password_hasher,
+    principal_cache,
+)
+
+LOGIN_RETRY_AFTER_SECONDS = 1
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
 
 auth_router = APIRouter(prefix="/users", tags=["Usuários"])
 
-def hash_password(password: str):
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def create_access_token(username: str):
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    return jwt.encode({"sub": username, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+def hashing_busy():
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Muitas tentativas de login simultâneas. Tente novamente em instantes.",
+        headers={"Retry-After": str(LOGIN_RETRY_AFTER_SECONDS)},
+    )
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+def issue_tokens(principal: Principal):
+    return {
+        "access_token": create_access_token(principal),
+        "refresh_token": create_refresh_token(principal),
+        "token_type": "bearer",
+    }
+
+async def load_principal(user_id: int, db: AsyncSession, use_cache: bool = True):
+    """Principal do cache; só consulta o banco (id, username e token_version, sem relacionamentos) em caso de miss."""
+    principal = principal_cache.get(user_id) if use_cache else None
+    if principal is None:
+        row = (await db.execute(
+            select(models.User.id, models.User.username, models.User.token_version).where(models.User.id == user_id)
+        )).first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuário não encontrado!")
+        principal = Principal(row.id, row.username, row.token_version)
+        principal_cache.put(principal)
+    return principal
+
+async def authorize(claims: Principal, db: AsyncSession, use_cache: bool = True):
+    """Principal atual do usuário do token; recusa tokens emitidos antes da última troca de senha."""
+    principal = await load_principal(claims.id, db, use_cache)
+    if claims.token_version != principal.token_version:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revogado. Faça login novamente.")
+    return principal
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido ou expirado!")
+        claims = decode_token(token, "access")
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido ou expirado!")
 
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if user is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuário não encontrado!")
-
-    return user
+    return await authorize(claims, db)
 
 @auth_router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user: UserCreate, db: Session = Depends(database.get_db)):
-    if db.query(models.User).filter(models.User.username == user.username).first():
+async def register(user: UserCreate, db: AsyncSession = Depends(database.get_async_db)):
+    if await db.scalar(select(models.User.id).where(models.User.username == user.username)):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Usuário já existe!")
 
+    try:
+        password_hash = await password_hasher.hash(user.password)
+    except PasswordHasherBusy:
+        raise hashing_busy()
+
     new_user = models.User(
         username=user.username,
-        password_hash=hash_password(user.password),
+        password_hash=password_hash,
         gender="N/A",
         age=0,
         occupation=0,
@@ -58,21 +85,73 @@ def register(user: UserCreate, db: Session = Depends(database.get_db)):
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     return new_user
 
 @auth_router.post("/login", response_model=Token)
-def login(user: UserLogin, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+async def login(user: UserLogin, db: AsyncSession = Depends(database.get_async_db)):
+    db_user = await db.scalar(select(models.User).options(raiseload("*")).where(models.User.username == user.username))
 
-    if not db_user or not verify_password(user.password, db_user.password_hash):
+    if not db_user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciais inválidas!")
 
-    token = create_access_token(db_user.username)
-    return {"access_token": token, "token_type": "bearer"}
+    try:
+        valid, new_hash = await password_hasher.verify(user.password, db_user.password_hash)
+    except PasswordHasherBusy:
+        raise hashing_busy()
+
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciais inválidas!")
+
+    if new_hash:
+        # Custo do bcrypt mudou desde o cadastro: regrava o hash de forma transparente.
+        db_user.password_hash = new_hash
+        await db.commit()
+
+    principal = Principal(db_user.id, db_user.username, db_user.token_version)
+    principal_cache.put(principal)
+    return issue_tokens(principal)
+
+@auth_router.post("/refresh", response_model=Token)
+async def refresh(data: RefreshRequest, db: AsyncSession = Depends(database.get_async_db)):
+    """Troca um refresh token válido por um novo par de tokens, sem passar pelo bcrypt."""
+    try:
+        claims = decode_token(data.refresh_token, "refresh")
+    except JWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token inválido ou expirado!")
+
+    # Sem cache: o refresh vale 30 dias e a revogação precisa valer em todos os workers na hora.
+    return issue_tokens(await authorize(claims, db, use_cache=False))
 
 @auth_router.get("/me", response_model=UserResponse)
-def get_me(current_user: models.User = Depends(get_current_user)):
+async def get_me(current_user: Principal = Depends(get_current_user)):
     return current_user
+
+@auth_router.patch("/me", response_model=UserResponse)
+async def update_me(
+    data: UserUpdate,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    user = await db.scalar(select(models.User).options(raiseload("*")).where(models.User.id == current_user.id))
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuário não encontrado!")
+
+    if data.username and data.username != user.username:
+        if await db.scalar(select(models.User.id).where(models.User.username == data.username)):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Usuário já existe!")
+        user.username = data.username
+
+    if data.password:
+        try:
+            user.password_hash = await password_hasher.hash(data.password)
+        except PasswordHasherBusy:
+            raise hashing_busy()
+        # Revoga os tokens já emitidos (inclusive os refresh tokens de 30 dias); o cliente faz login de novo.
+        user.token_version += 1
+
+    await db.commit()
+    principal_cache.invalidate(user.id)
+    return user
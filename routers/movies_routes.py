@@ -1,201 +1,309 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+import asyncio
+import math
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, raiseload, defer
+from decimal import Decimal, InvalidOperation
 from typing import List, Optional
-import pandas as pd
 from pydantic import BaseModel
-from sklearn.neighbors import NearestNeighbors
-from sklearn.preprocessing import StandardScaler
-import numpy as np
-from scipy.sparse import csr_matrix
 from app import models, schemas, database
+from routers.auth_routes import get_current_user
+from services.genre_service import genre_catalog, split_genres
+from services.image_service import POSTER_CACHE_MAX_AGE, Poster, decode_poster, etag_matches, poster_cache
+from services.knn_service import user_knn_engine
+from services.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from services.popularity_service import popularity_ranking
+from services.recommendation_cache import recommendation_cache
+from services.search_service import movie_search_index
+from services.vote_pipeline import UNCHANGED, UnknownVoteTarget, VoteQueueFull, vote_pipeline
 
 router = APIRouter(prefix="/movies", tags=["Filmes"])
 
-_model_cache = None
-_user_movie_matrix = None
-_scaler = StandardScaler()
-
 class UserVote(BaseModel):
     user_id: int
     movie_id: int
 
-def format_movie_response(movie: models.Movie, db: Session):
+def movie_load_options(include_image: bool = False):
+    options = [raiseload("*")]
+    if not include_image:
+        options.append(defer(models.Movie.image_base64, raiseload=True))
+    return options
+
+def parse_cursor(after: Optional[str], *keys):
+    if after is None:
+        return None
+    try:
+        payload = decode_cursor(after)
+        return [payload[key] for key in keys]
+    except (ValueError, KeyError):
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido.")
+
+def fetch_movies_in_order(db: Session, movie_ids, include_image: bool = False):
+    """Busca os filmes com um único IN e preserva a ordem dos IDs recebidos."""
+    if not movie_ids:
+        return []
+    movies = db.query(models.Movie).options(*movie_load_options(include_image)).filter(models.Movie.id.in_(movie_ids)).all()
+    movies_by_id = {movie.id: movie for movie in movies}
+    return [movies_by_id[movie_id] for movie_id in movie_ids if movie_id in movies_by_id]
+
+async def fetch_movies_in_order_async(db: AsyncSession, movie_ids, include_image: bool = False):
+    if not movie_ids:
+        return []
+    result = await db.scalars(select(models.Movie).options(*movie_load_options(include_image)).where(models.Movie.id.in_(movie_ids)))
+    movies_by_id = {movie.id: movie for movie in result}
+    return [movies_by_id[movie_id] for movie_id in movie_ids if movie_id in movies_by_id]
+
+def format_movie_response(movie: models.Movie, include_image: bool = False):
     return {
         "id": movie.id,
         "title": movie.title,
         "year": movie.year,
         "genres": movie.genres,
-        "image_base64": movie.image_base64,
-        "rating": movie.average_rating(db),
+        "rating": movie.average_rating(),
+        "poster_url": f"/movies/{movie.id}/poster" if movie.has_poster else None,
+        "thumbnail_url": f"/movies/{movie.id}/poster?size=thumb" if movie.has_poster else None,
+        "image_base64": movie.image_base64 if include_image else None,
     }
 
 @router.get("/", response_model=List[schemas.MovieResponse])
-def get_movies(
+async def get_movies(
+    response: Response,
     title: Optional[str] = Query(None),
     year: Optional[int] = Query(None),
     genres: Optional[str] = Query(None),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(database.get_db),
+    after: Optional[str] = Query(None, description="Cursor opaco retornado no header X-Next-Cursor; substitui o offset."),
+    include_image: bool = Query(False),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
-    query = db.query(models.Movie)
-    
-    if title:
-        query = query.filter(models.Movie.title.ilike(f"%{title}%"))
-    if year:
-        query = query.filter(models.Movie.year == year)
-    if genres:
-        query = query.filter(models.Movie.genres.ilike(f"%{genres}%"))
-
-    movies = query.offset(offset).limit(limit).all()
+    query = select(models.Movie).options(*movie_load_options(include_image))
+    cursor = parse_cursor(after, "id")
+
+    if title or genres:
+        # Os índices em memória usam a API síncrona; run_sync os executa sobre a mesma conexão assíncrona.
+        await db.run_sync(movie_search_index.refresh_if_changed)
+        ranked_ids = movie_search_index.search(title=title, genres=genres, year=year)
+        if cursor:
+            try:
+                offset = ranked_ids.index(cursor[0]) + 1
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Cursor de paginação expirado.")
+        movies = await fetch_movies_in_order_async(db, ranked_ids[offset:offset + limit], include_image)
+    else:
+        if year:
+            query = query.where(models.Movie.year == year)
+        if cursor:
+            query = query.where(models.Movie.id > cursor[0]).order_by(models.Movie.id).limit(limit)
+        else:
+            query = query.order_by(models.Movie.id).offset(offset).limit(limit)
+        movies = (await db.scalars(query)).all()
+
     if not movies:
         raise HTTPException(status_code=404, detail="Nenhum filme encontrado.")
 
-    return [format_movie_response(movie, db) for movie in movies]
+    if len(movies) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"id": movies[-1].id})
+
+    return [format_movie_response(movie, include_image) for movie in movies]
 
 @router.get("/{movie_id}", response_model=schemas.MovieResponse)
-def get_movie(movie_id: int, db: Session = Depends(database.get_db)):
-    movie = db.query(models.Movie).filter(models.Movie.id == movie_id).first()
+async def get_movie(movie_id: int, include_image: bool = Query(False), db: AsyncSession = Depends(database.get_async_db)):
+    movie = await db.scalar(
+        select(models.Movie)
+        .options(*movie_load_options(include_image))
+        .where(models.Movie.id == movie_id)
+    )
     if not movie:
         raise HTTPException(status_code=404, detail=f"Filme com ID {movie_id} não encontrado.")
-    return format_movie_response(movie, db)
+    return format_movie_response(movie, include_image)
+
+async def load_stored_poster(db: AsyncSession, movie_id: int, size: str):
+    """Variante binária gravada pelo ETL; sem miniatura, cai para a imagem completa."""
+    variants = (size, "full") if size != "full" else ("full",)
+    rows = (await db.execute(
+        select(models.MovieImage.variant, models.MovieImage.data, models.MovieImage.media_type, models.MovieImage.sha256)
+        .where(models.MovieImage.movie_id == movie_id, models.MovieImage.variant.in_(variants))
+    )).all()
+    by_variant = {row.variant: row for row in rows}
+    row = next((by_variant[variant] for variant in variants if variant in by_variant), None)
+    return Poster(row.data, row.media_type, f'"{row.sha256}"') if row else None
+
+@router.get("/{movie_id}/poster")
+async def get_movie_poster(
+    movie_id: int,
+    request: Request,
+    size: str = Query("full", pattern="^(thumb|full)$"),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    poster = poster_cache.get((movie_id, size))
 
-@router.post("/like/")
-def like_movie(data: UserVote, db: Session = Depends(database.get_db)):
-    existing_like = db.query(models.Rating).filter(
-        models.Rating.user_id == data.user_id,
-        models.Rating.movie_id == data.movie_id
-    ).first()
+    if poster is None:
+        poster = await load_stored_poster(db, movie_id, size)
 
-    if existing_like:
-        return {"message": "Você já curtiu esse filme!"}
+        if poster is None:
+            # Filmes carregados antes da tabela movie_images: decodifica o base64 legado.
+            row = (await db.execute(select(models.Movie.image_base64).where(models.Movie.id == movie_id))).first()
+            if row is None:
+                raise HTTPException(status_code=404, detail=f"Filme com ID {movie_id} não encontrado.")
+            if not row.image_base64:
+                raise HTTPException(status_code=404, detail=f"Filme com ID {movie_id} não possui pôster.")
+
+            try:
+                poster = decode_poster(row.image_base64)
+            except ValueError:
+                raise HTTPException(status_code=404, detail=f"Pôster do filme {movie_id} está corrompido.")
+
+        poster_cache.put((movie_id, size), poster)
+
+    headers = {"ETag": poster.etag, "Cache-Control": f"public, max-age={POSTER_CACHE_MAX_AGE}"}
+
+    if etag_matches(request.headers.get("if-none-match"), poster.etag):
+        return Response(status_code=304, headers=headers)
 
-    db.add(models.Rating(user_id=data.user_id, movie_id=data.movie_id, rating=5))
-    db.commit()
+    return Response(content=poster.data, media_type=poster.media_type, headers=headers)
 
+VOTE_RETRY_AFTER_SECONDS = 1
+
+async def submit_vote(data: UserVote, rating: int, ack: str, response: Response):
+    """Enfileira o voto no pipeline; com ack="committed" espera o commit do lote, com "queued" responde 202."""
+    try:
+        future = vote_pipeline.submit(data.user_id, data.movie_id, rating)
+    except VoteQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Muitos votos pendentes, tente novamente.",
+            headers={"Retry-After": str(VOTE_RETRY_AFTER_SECONDS)},
+        )
+    if ack == "queued":
+        response.status_code = 202
+        return None
+    try:
+        return await asyncio.wrap_future(future)
+    except UnknownVoteTarget:
+        raise HTTPException(status_code=404, detail="Usuário ou filme não encontrado.")
+    except SQLAlchemyError:
+        raise HTTPException(status_code=500, detail="Erro ao registrar o voto.")
+
+@router.post("/like/")
+async def like_movie(data: UserVote, response: Response, ack: str = Query("committed", pattern="^(committed|queued)$")):
+    outcome = await submit_vote(data, 5, ack, response)
+    if outcome is None:
+        return {"message": "Voto recebido!"}
+    if outcome == UNCHANGED:
+        return {"message": "Você já curtiu esse filme!"}
     return {"message": "Filme curtido com sucesso!"}
 
 @router.post("/dislike/")
-def dislike_movie(data: UserVote, db: Session = Depends(database.get_db)):
-    db.add(models.Rating(user_id=data.user_id, movie_id=data.movie_id, rating=0))
-    db.commit()
+async def dislike_movie(data: UserVote, response: Response, ack: str = Query("committed", pattern="^(committed|queued)$")):
+    outcome = await submit_vote(data, 0, ack, response)
+    if outcome is None:
+        return {"message": "Voto recebido!"}
     return {"message": "Filme descurtido!"}
 
+@router.get("/votes/status")
+def votes_status():
+    """Estado do pipeline de votos (fila, lotes gravados, tamanho médio do lote)."""
+    return vote_pipeline.status()
+
 @router.get("/popular-movies/", response_model=List[schemas.MovieResponse])
-def get_popular_movies(
+async def get_popular_movies(
+    response: Response,
     limit: int = Query(10, ge=1, le=50),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(database.get_db),
+    after: Optional[str] = Query(None, description="Cursor opaco retornado no header X-Next-Cursor; substitui o offset."),
+    include_image: bool = Query(False),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
-    popular_movies = (
-        db.query(models.Movie)
-        .join(models.Rating)
-        .group_by(models.Movie.id)
-        .order_by(
-            func.count(models.Rating.id).desc(),
-            func.coalesce(func.avg(models.Rating.rating), 0).desc(),
-        )
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
+    cursor = parse_cursor(after, "count", "avg", "id")
+    if cursor:
+        try:
+            cursor = (int(cursor[0]), Decimal(cursor[1]), int(cursor[2]))
+        except (InvalidOperation, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Cursor de paginação inválido.")
+
+    entries = await db.run_sync(popularity_ranking.page, offset=offset, limit=limit, after=cursor)
+    popular_movies = await fetch_movies_in_order_async(db, [movie_id for movie_id, _, _ in entries], include_image)
 
     if not popular_movies:
         raise HTTPException(status_code=404, detail="Nenhum filme popular encontrado.")
 
-    return [format_movie_response(movie, db) for movie in popular_movies]
-
-
-
-def train_collaborative_model(db):
-    ratings = db.query(models.Rating).all()
+    if len(entries) == limit:
+        movie_id, count, avg = entries[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"count": count, "avg": str(avg), "id": movie_id})
 
-    if not ratings:
-        return None  
+    return [format_movie_response(movie, include_image) for movie in popular_movies]
 
-    df = pd.DataFrame([(r.user_id, r.movie_id, r.rating) for r in ratings], 
-                      columns=["user_id", "movie_id", "rating"])
 
-    if df.empty or len(df["user_id"].unique()) < 2:
-        return None  
-
-    user_movie_matrix = df.pivot(index="user_id", columns="movie_id", values="rating").fillna(0)
-    user_movie_matrix = user_movie_matrix.astype(np.float32)
-
-    sparse_matrix = csr_matrix(user_movie_matrix)
-
-    model = NearestNeighbors(metric="cosine", algorithm="brute")
-    model.fit(sparse_matrix)
+@router.post("/popular-movies/rebuild", dependencies=[Depends(get_current_user)])
+def rebuild_popular_movies(db: Session = Depends(database.get_db)):
+    """Força a reconstrução do ranking de popularidade em memória (exige login; no máximo uma a cada
+    `POPULARITY_MIN_REBUILD_SECONDS`, já que cada reconstrução lê todos os filmes avaliados)."""
+    wait = popularity_ranking.min_rebuild_seconds - popularity_ranking.age()
+    if wait > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Ranking reconstruído há pouco. Tente novamente em instantes.",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+    return popularity_ranking.rebuild(db)
 
-    return model, user_movie_matrix  
 
-def recommend_by_genre(user_id: int, db: Session):
-    last_liked_movie = (
-        db.query(models.Rating)
-        .filter(models.Rating.user_id == user_id)
-        .order_by(models.Rating.id.desc())
-        .first()
-    )
+def recommend_by_genre(user_id: int, db: Session, include_image: bool = False):
+    last_liked_movie_id = db.execute(models.last_rated_movie_query(user_id)).scalar()
 
-    if not last_liked_movie:
+    if last_liked_movie_id is None:
         return []
 
-    liked_movie = db.query(models.Movie).filter(models.Movie.id == last_liked_movie.movie_id).first()
+    liked_movie = db.query(models.Movie).options(*movie_load_options()).filter(models.Movie.id == last_liked_movie_id).first()
 
     if not liked_movie:
         return []
 
+    genre_mask = genre_catalog.mask_for(split_genres(liked_movie.genres)[:1], db)
+    if not genre_mask:
+        return []
+
     similar_movies = (
         db.query(models.Movie)
-        .filter(models.Movie.genres.ilike(f"%{liked_movie.genres.split('|')[0]}%"))
+        .options(*movie_load_options(include_image))
+        .filter(models.Movie.genre_mask.op("&")(genre_mask) != 0)
         .limit(5)
         .all()
     )
 
     return similar_movies
-@router.get("/recommend/{user_id}")
-def recommend_movies(user_id: int, db: Session = Depends(database.get_db)):
-    global _model_cache, _user_movie_matrix
 
-    if _model_cache is None or _user_movie_matrix is None:
-        result = train_collaborative_model(db)
-        if result is None:
-            return recommend_by_genre(user_id, db)  
-        _model_cache, _user_movie_matrix = result  
+def collaborative_recommendations(user_id: int, db: Session, include_image: bool = False):
+    user_knn_engine.ensure_built(db)
+    if not user_knn_engine.ready:
+        return recommend_by_genre(user_id, db, include_image)
 
-    liked_movies = db.query(models.Rating.movie_id).filter(
-        models.Rating.user_id == user_id,
-        models.Rating.rating == 5
-    ).all()
+    liked_movie_ids = set(db.execute(models.liked_movies_query(user_id)).scalars())
 
-    if not liked_movies:
-        return recommend_by_genre(user_id, db)  
+    if not liked_movie_ids:
+        return recommend_by_genre(user_id, db, include_image)
 
-    liked_movie_ids = {movie.movie_id for movie in liked_movies}  
+    recommended_movie_ids = user_knn_engine.recommend(user_id, liked_movie_ids, n=5)
+    if not recommended_movie_ids:
+        return recommend_by_genre(user_id, db, include_image)
 
-    if user_id not in _user_movie_matrix.index:
-        return recommend_by_genre(user_id, db)  
+    recommended_movies = fetch_movies_in_order(db, recommended_movie_ids, include_image)
 
-    user_index = list(_user_movie_matrix.index).index(user_id)
-    distances, indices = _model_cache.kneighbors([_user_movie_matrix.iloc[user_index]], n_neighbors=5)
+    if not recommended_movies:
+        return recommend_by_genre(user_id, db, include_image)
 
-    similar_users = _user_movie_matrix.iloc[indices[0][1:]].mean()
-    recommended_movie_ids = [m for m in similar_users.sort_values(ascending=False).index.tolist() if m not in liked_movie_ids][:5]  
+    return recommended_movies
 
-    recommended_movies = db.query(models.Movie).filter(models.Movie.id.in_(recommended_movie_ids)).limit(5).all()
+@router.get("/recommend/{user_id}", response_model=List[schemas.MovieResponse])
+def recommend_movies(user_id: int, include_image: bool = Query(False), db: Session = Depends(database.get_db)):
+    def render():
+        movies = collaborative_recommendations(user_id, db, include_image)
+        return [format_movie_response(movie, include_image) for movie in movies]
 
-    if not recommended_movies:
-        return recommend_by_genre(user_id, db)  
-
-    return [
-        {
-            "id": movie.id,
-            "title": movie.title,
-            "year": movie.year,
-            "genres": movie.genres,
-            "image_base64": movie.image_base64,
-            "tmdb_image": movie.tmdb_image
-        }
-        for movie in recommended_movies
-    ]
\ No newline at end of file
+    # Listas com image_base64 são grandes demais para o cache; o pôster já tem o próprio endpoint cacheado.
+    if include_image:
+        return render()
+    return recommendation_cache.get_or_compute(user_id, "knn", user_knn_engine.version, render)
@@ -1,26 +1,61 @@
+import math
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app import database
+from app.schemas import BatchRecommendationRequest
+from routers.auth_routes import get_current_user
 from services.recommend_service import (
+    collaborative_registry,
+    get_batch_user_recommendations,
     get_movie_recommendations,
     get_user_recommendations,
-    train_collaborative_model
 )
+from services.rating_events import rating_event_consumer
+from services.recommendation_cache import recommendation_cache
 
 # 🔹 Configuração do Router
 recommender_router = APIRouter(prefix="/recommend", tags=["Recomendações"])
 
-# 🔹 Cache do modelo colaborativo (evita recomputação desnecessária)
-_model_cache = None
+def get_current_model():
+    """Retorna a versão do modelo colaborativo em produção (treinada em segundo plano)."""
+    current = collaborative_registry.current()
+    if current is None:
+        if collaborative_registry.training:
+            raise HTTPException(status_code=503, detail="Modelo de recomendação em treinamento. Tente novamente em instantes.")
+        raise HTTPException(status_code=400, detail="Não há avaliações suficientes para gerar recomendações.")
+    return current
 
-def get_model_cache(db: Session):
-    """Garante que o modelo colaborativo seja treinado apenas uma vez."""
-    global _model_cache
-    if _model_cache is None:
-        _model_cache = train_collaborative_model(db)
-        if _model_cache is None:
-            raise HTTPException(status_code=400, detail="Não há avaliações suficientes para gerar recomendações.")
-    return _model_cache
+@recommender_router.get("/model")
+def get_model_status():
+    """Versão, horário de treino e idade do modelo colaborativo em uso."""
+    return collaborative_registry.status()
+
+@recommender_router.post("/model/retrain", status_code=202, dependencies=[Depends(get_current_user)])
+def retrain_model():
+    """Agenda um novo treino em segundo plano; a versão atual continua sendo servida.
+
+    Exige login. Pedidos com um treino já na fila são agrupados nele; fora isso, no máximo um pedido a cada
+    `MODEL_MIN_RETRAIN_SECONDS`.
+    """
+    wait = collaborative_registry.retry_after()
+    if wait > 0 and not collaborative_registry.retrain_pending:
+        raise HTTPException(
+            status_code=429,
+            detail="Retreino pedido há pouco. Tente novamente em instantes.",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+    collaborative_registry.request_retrain()
+    return collaborative_registry.status()
+
+@recommender_router.get("/knn")
+def get_knn_status():
+    """Eventos de avaliação pendentes/aplicados e drift da matriz do kNN desde a última reconstrução."""
+    return rating_event_consumer.status()
+
+@recommender_router.get("/cache")
+def get_cache_status():
+    """Acertos, falhas e invalidações do cache de listas de recomendação por usuário."""
+    return recommendation_cache.status()
 
 @recommender_router.get("/{movie_id}")
 def recommend_movies(movie_id: int, db: Session = Depends(database.get_db)):
@@ -33,6 +68,16 @@ def recommend_movies(movie_id: int, db: Session = Depends(database.get_db)):
 @recommender_router.get("/user/{user_id}")
 def recommend_for_user(user_id: int, db: Session = Depends(database.get_db)):
     """Recomenda filmes personalizados para um usuário baseado no modelo colaborativo."""
-    model_cache = get_model_cache(db)
-    recommendations = get_user_recommendations(user_id, db, model_cache)
-    return {"user_id": user_id, "recommendations": recommendations}
+    current = get_current_model()
+    recommendations = recommendation_cache.get_or_compute(
+        user_id, "svd", current.version, lambda: get_user_recommendations(user_id, db, current.model)
+    )
+    return {"user_id": user_id, "model_version": current.version, "recommendations": recommendations}
+
+@recommender_router.post("/users/batch")
+def recommend_for_users(request: BatchRecommendationRequest, db: Session = Depends(database.get_db)):
+    """Pré-calcula recomendações para vários usuários de uma vez (pontuação em lote)."""
+    current = get_current_model()
+    user_ids = list(dict.fromkeys(request.user_ids))
+    recommendations = get_batch_user_recommendations(user_ids, db, current.model, request.n)
+    return {"model_version": current.version, "recommendations": recommendations}
@@ -1,17 +1,29 @@
 from passlib.context import CryptContext
-from jose import jwt
+from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from app.models import User
-from app.schemas import UserCreate
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import multiprocessing
 import os
+import threading
+import time
 
-SECRET_KEY = "secret"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
-REMEMBER_ME_EXPIRE_DAYS = 30
+# Configuração única de assinatura dos tokens, usada por routers/auth_routes.py.
+SECRET_KEY = os.getenv("JWT_SECRET_KEY", "supersecretkey")
+ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "300"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "50000"))
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max((os.cpu_count() or 2) // 2, 1))))
+PASSWORD_HASH_MAX_WAITING = int(os.getenv("PASSWORD_HASH_MAX_WAITING", "32"))
+PASSWORD_HASH_WAIT_SECONDS = float(os.getenv("PASSWORD_HASH_WAIT_SECONDS", "2"))
+
+password_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     return password_context.hash(password)
@@ -19,28 +31,148 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password, hashed_password):
     return password_context.verify(plain_password, hashed_password)
 
-def create_access_token(data: dict, expires_delta: timedelta):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + expires_delta
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-
-def register_user(db: Session, user_data: UserCreate):
-    if db.query(User).filter(User.email == user_data.email).first():
-        return {"error": "Email já cadastrado"}
-    
-    hashed_password = hash_password(user_data.password)
-    new_user = User(email=user_data.email, hashed_password=hashed_password)
-    db.add(new_user)
-    db.commit()
-    return {"message": "Usuário registrado com sucesso"}
-
-def authenticate_user(db: Session, email: str, password: str, remember_me: bool):
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
-        return None
-    
-    expire_time = timedelta(days=REMEMBER_ME_EXPIRE_DAYS) if remember_me else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token({"sub": user.email}, expires_delta=expire_time)
-    
-    return {"access_token": access_token, "token_type": "bearer"}
+def verify_and_rehash(plain_password, hashed_password):
+    """Verifica a senha e, se o custo do hash mudou (`needs_update`), devolve o novo hash junto."""
+    if not hashed_password or not verify_password(plain_password, hashed_password):
+        return False, None
+    if password_context.needs_update(hashed_password):
+        return True, hash_password(plain_password)
+    return True, None
+
+
+class PasswordHasherBusy(Exception):
+    """A fila de hashing está cheia (ou a espera estourou); o cliente deve tentar mais tarde."""
+
+
+class PasswordHasher:
+    """Executa o bcrypt em um pool de processos dedicado, fora do GIL e do pool de threads das requisições.
+
+    No máximo `workers` hashes rodam ao mesmo tempo; até `max_waiting` chamadas aguardam na fila por
+    `wait_seconds`, e o excedente é recusado na hora com `PasswordHasherBusy`.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_waiting: int = PASSWORD_HASH_MAX_WAITING, wait_seconds: float = PASSWORD_HASH_WAIT_SECONDS):
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self.wait_seconds = wait_seconds
+        self.waiting = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(workers)
+        self._executor = None
+
+    def start(self):
+        if self._executor is None:
+            # "spawn": os workers sobem sob demanda, quando as threads do pipeline de votos, do kNN e do
+            # registro de modelos já rodam; um fork herdaria locks presos por elas e poderia travar o filho.
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        if self._slots.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.wait_seconds)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        finally:
+            self.waiting -= 1
+
+        try:
+            self.start()
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str):
+        """Retorna (senha válida, novo hash ou None)."""
+        return await self._run(verify_and_rehash, plain_password, hashed_password)
+
+
+password_hasher = PasswordHasher()
+
+class Principal:
+    """O mínimo do usuário necessário para autorizar uma requisição."""
+
+    __slots__ = ("id", "username", "token_version")
+
+    def __init__(self, id: int, username: str, token_version: int = 0):
+        self.id = id
+        self.username = username
+        self.token_version = token_version
+
+
+def _encode_token(principal: Principal, token_type: str, expires_delta: timedelta) -> str:
+    claims = {
+        "sub": str(principal.id),
+        "username": principal.username,
+        "type": token_type,
+        "ver": principal.token_version,
+        "exp": datetime.utcnow() + expires_delta,
+    }
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+def create_access_token(principal: Principal) -> str:
+    return _encode_token(principal, "access", timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+
+def create_refresh_token(principal: Principal) -> str:
+    return _encode_token(principal, "refresh", timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+
+def decode_token(token: str, token_type: str) -> Principal:
+    """Valida assinatura, expiração e tipo; levanta `JWTError` se o token não servir."""
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    if payload.get("type") != token_type:
+        raise JWTError("Tipo de token inesperado.")
+    try:
+        return Principal(int(payload["sub"]), payload.get("username"), int(payload.get("ver", 0)))
+    except (KeyError, TypeError, ValueError):
+        raise JWTError("Token sem identificador de usuário.")
+
+
+class PrincipalCache:
+    """Cache LRU + TTL de `Principal` por id, para que requisições autenticadas não consultem o banco."""
+
+    def __init__(self, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS, max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def put(self, principal: Principal):
+        with self._lock:
+            self._entries[principal.id] = (time.monotonic() + self.ttl_seconds, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache()
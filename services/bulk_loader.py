@@ -0,0 +1,199 @@
+import os
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+from sqlalchemy import Column, Integer, MetaData, String, Table, UniqueConstraint, and_, bindparam, func, select
+from sqlalchemy.dialects import mysql, sqlite
+
+ETL_CHUNK_SIZE = int(os.getenv("ETL_CHUNK_SIZE", "20000"))
+
+progress_metadata = MetaData()
+
+etl_progress = Table(
+    "etl_progress",
+    progress_metadata,
+    Column("table_name", String(64), primary_key=True),
+    Column("rows_loaded", Integer, nullable=False),
+)
+
+
+def deferrable_indexes(table: Table):
+    """Índices secundários que podem ser removidos durante a carga.
+
+    Únicos ficam. Um índice que começa por uma coluna de FK só sai se outro índice mantido também começar por
+    ela, já que o MySQL exige um índice de apoio para cada FK.
+    """
+    kept = [table.primary_key] + [constraint for constraint in table.constraints if isinstance(constraint, UniqueConstraint)]
+    kept += [index for index in table.indexes if index.unique]
+    leading = {list(constraint.columns)[0] for constraint in kept if len(constraint.columns)}
+
+    deferrable = []
+    for index in sorted(table.indexes, key=lambda index: index.name):
+        if index.unique:
+            continue
+        first = list(index.columns)[0]
+        if first.foreign_keys and first not in leading:
+            leading.add(first)
+            continue
+        deferrable.append(index)
+    return deferrable
+
+
+def upsert_statement(table: Table, dialect: str, keys, update_columns):
+    """INSERT que atualiza `update_columns` quando a chave já existe (ou ignora, se não houver o que atualizar)."""
+    if dialect == "mysql":
+        statement = mysql.insert(table)
+        if not update_columns:
+            return statement.prefix_with("IGNORE")
+        return statement.on_duplicate_key_update({column: statement.inserted[column] for column in update_columns})
+    if dialect == "sqlite":
+        statement = sqlite.insert(table)
+        if not update_columns:
+            return statement.on_conflict_do_nothing(index_elements=keys)
+        return statement.on_conflict_do_update(index_elements=keys, set_={column: statement.excluded[column] for column in update_columns})
+    raise NotImplementedError(f"Upsert não suportado para o dialeto {dialect}.")
+
+
+def frame_records(frame: pd.DataFrame):
+    """Converte um bloco em dicts com tipos nativos do Python, trocando NaN/NaT por None."""
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict(orient="records")
+
+
+class ChunkedLoader:
+    """Carga em blocos com executemany e commit por bloco, retomável a partir do último bloco gravado.
+
+    O progresso de cada tabela fica em `etl_progress` na mesma transação do bloco, então após uma falha a
+    próxima execução continua exatamente de onde parou. Durante a carga, FKs e checagens de unicidade são
+    desligadas na sessão e os índices secundários só são recriados no fim.
+    Funciona com MySQL e com SQLite (usado como substituto local).
+    """
+
+    def __init__(self, engine, chunk_size: int = ETL_CHUNK_SIZE, on_progress=None):
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress
+        progress_metadata.create_all(engine)
+
+    def count(self, table: Table) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(table)).scalar()
+
+    def rows_loaded(self, table_name: str) -> int:
+        with self.engine.connect() as conn:
+            value = conn.execute(select(etl_progress.c.rows_loaded).where(etl_progress.c.table_name == table_name)).scalar()
+        return value or 0
+
+    def reset(self, table_name: str):
+        with self.engine.begin() as conn:
+            conn.execute(etl_progress.delete().where(etl_progress.c.table_name == table_name))
+
+    def _save_progress(self, conn, table_name: str, rows_loaded: int):
+        updated = conn.execute(
+            etl_progress.update().where(etl_progress.c.table_name == table_name).values(rows_loaded=rows_loaded)
+        ).rowcount
+        if not updated:
+            conn.execute(etl_progress.insert().values(table_name=table_name, rows_loaded=rows_loaded))
+
+    @contextmanager
+    def _relaxed_checks(self, conn):
+        dialect = conn.dialect.name
+        if dialect == "mysql":
+            conn.exec_driver_sql("SET foreign_key_checks = 0")
+            conn.exec_driver_sql("SET unique_checks = 0")
+        elif dialect == "sqlite":
+            conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+        try:
+            yield
+        finally:
+            if dialect == "mysql":
+                conn.exec_driver_sql("SET unique_checks = 1")
+                conn.exec_driver_sql("SET foreign_key_checks = 1")
+            elif dialect == "sqlite":
+                conn.exec_driver_sql("PRAGMA foreign_keys = ON")
+
+    def restore_indexes(self, table: Table):
+        """Recria os índices adiados que faltam (a carga pode ter caído entre o último bloco e a recriação)."""
+        with self.engine.connect() as conn:
+            for index in deferrable_indexes(table):
+                index.create(conn, checkfirst=True)
+            conn.commit()
+
+    def load(self, table: Table, frame: pd.DataFrame) -> int:
+        """Insere `frame` em `table` a partir da última linha gravada; retorna quantas linhas foram inseridas agora."""
+        total = len(frame)
+        done = self.rows_loaded(table.name)
+        if done >= total:
+            print(f"⏭️ {table.name}: {total} linhas já carregadas.")
+            self.restore_indexes(table)
+            return 0
+
+        indexes = deferrable_indexes(table)
+        started = time.perf_counter()
+        with self.engine.connect() as conn:
+            conn.commit()
+            with self._relaxed_checks(conn):
+                for index in indexes:
+                    index.drop(conn, checkfirst=True)
+                conn.commit()
+
+                for start in range(done, total, self.chunk_size):
+                    end = min(start + self.chunk_size, total)
+                    conn.execute(table.insert(), frame_records(frame.iloc[start:end]))
+                    self._save_progress(conn, table.name, end)
+                    conn.commit()
+                    if self.on_progress:
+                        self.on_progress(table.name, end, total)
+
+                for index in indexes:
+                    index.create(conn, checkfirst=True)
+                conn.commit()
+
+        elapsed = time.perf_counter() - started
+        print(f"✅ {table.name}: {total - done} linhas em {elapsed:.1f}s ({(total - done) / max(elapsed, 1e-9):.0f} linhas/s).")
+        return total - done
+
+    def _execute_chunks(self, statement, table_name: str, frame: pd.DataFrame):
+        with self.engine.connect() as conn:
+            if callable(statement):
+                statement = statement(conn.dialect.name)
+            for start in range(0, len(frame), self.chunk_size):
+                end = min(start + self.chunk_size, len(frame))
+                conn.execute(statement, frame_records(frame.iloc[start:end]))
+                conn.commit()
+                if self.on_progress:
+                    self.on_progress(table_name, end, len(frame))
+        return len(frame)
+
+    def upsert(self, table: Table, frame: pd.DataFrame, keys, update_columns=()) -> int:
+        """Insere ou atualiza `frame` por `keys` em blocos; idempotente, então pode ser repetido após uma falha."""
+        if frame.empty:
+            return 0
+        statement = lambda dialect: upsert_statement(table, dialect, list(keys), list(update_columns))
+        self._execute_chunks(statement, table.name, frame)
+        print(f"✅ {table.name}: {len(frame)} linhas inseridas/atualizadas.")
+        return len(frame)
+
+    def append(self, table: Table, frame: pd.DataFrame) -> int:
+        """INSERT simples em blocos, para linhas que já se sabe serem novas."""
+        if frame.empty:
+            return 0
+        self._execute_chunks(table.insert(), table.name, frame)
+        print(f"✅ {table.name}: {len(frame)} linhas novas.")
+        return len(frame)
+
+    def update(self, table: Table, frame: pd.DataFrame, keys, columns) -> int:
+        """UPDATE em blocos (executemany) de `columns`, localizando cada linha por `keys`."""
+        if frame.empty:
+            return 0
+        # Os nomes dos parâmetros não podem coincidir com os das colunas do SET.
+        statement = (
+            table.update()
+            .where(and_(*(table.c[key] == bindparam(f"b_{key}") for key in keys)))
+            .values({column: bindparam(f"b_{column}") for column in columns})
+        )
+        renamed = frame[list(keys) + list(columns)].rename(columns=lambda column: f"b_{column}")
+        self._execute_chunks(statement, table.name, renamed)
+        print(f"✅ {table.name}: {len(frame)} linhas atualizadas.")
+        return len(frame)
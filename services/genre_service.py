@@ -0,0 +1,99 @@
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app import models
+
+# Ordem canônica do MovieLens: define o bit de cada gênero na coluna `movies.genre_mask`.
+GENRES = [
+    "Action", "Adventure", "Animation", "Children's", "Comedy", "Crime",
+    "Documentary", "Drama", "Fantasy", "Film-Noir", "Horror", "Musical",
+    "Mystery", "Romance", "Sci-Fi", "Thriller", "War", "Western",
+]
+MAX_GENRES = 63
+
+
+def split_genres(genres: str):
+    return [g.strip() for g in (genres or "").split("|") if g.strip()]
+
+
+def build_genre_bits(genre_strings):
+    """Atribui um bit a cada gênero: primeiro os canônicos, depois os extras em ordem alfabética."""
+    seen = {g for value in genre_strings for g in split_genres(value)}
+    names = [g for g in GENRES if g in seen] + sorted(seen - set(GENRES))
+    if len(names) > MAX_GENRES:
+        raise ValueError(f"Máximo de {MAX_GENRES} gêneros suportados na máscara, encontrados {len(names)}.")
+    canonical = {g: i for i, g in enumerate(GENRES)}
+    extra_bits = iter(range(len(GENRES), MAX_GENRES))
+    return {g: canonical[g] if g in canonical else next(extra_bits) for g in names}
+
+
+def mask_from_names(names, bits):
+    """Retorna a máscara dos gêneros (`bits` indexado em minúsculas), ou None se algum for desconhecido."""
+    mask = 0
+    for name in names:
+        bit = bits.get(name.lower())
+        if bit is None:
+            return None
+        mask |= 1 << bit
+    return mask
+
+
+def genre_feature_matrix(masks, n_bits: int = None):
+    """Expande um vetor de máscaras em uma matriz densa (n_filmes × n_gêneros) de 0/1."""
+    masks = np.asarray(masks, dtype=np.int64)
+    if n_bits is None:
+        n_bits = max(int(masks.max()).bit_length(), len(GENRES)) if masks.size else len(GENRES)
+    return ((masks[:, None] >> np.arange(n_bits, dtype=np.int64)) & 1).astype(np.float32)
+
+
+def genre_idf(features):
+    """IDF suavizado do TfidfVectorizer: ln((1 + n) / (1 + df)) + 1."""
+    document_frequency = features.sum(axis=0)
+    return (np.log((1 + features.shape[0]) / (1 + document_frequency)) + 1).astype(np.float32)
+
+
+def tfidf_weight(features, idf=None):
+    """Aplica o IDF e a normalização L2 do TfidfVectorizer às features binárias."""
+    if idf is None:
+        idf = genre_idf(features)
+    weighted = features * idf
+    norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return weighted / norms
+
+
+class GenreCatalog:
+    """Mapeamento nome → bit carregado da tabela `genres` (com fallback para a ordem canônica)."""
+
+    def __init__(self):
+        self._bits = None
+
+    def bits(self, db: Session):
+        bits = self._bits
+        if bits is None:
+            # Sem lock: roda em greenlets no event loop (via run_sync), onde esperar por um lock durante a
+            # consulta de outra requisição trava o loop. Cargas simultâneas só repetem a mesma consulta.
+            rows = db.query(models.Genre.name, models.Genre.bit).all()
+            names = rows or [(g, i) for i, g in enumerate(GENRES)]
+            bits = self._bits = {name.lower(): bit for name, bit in names}
+        return bits
+
+    def mask_for(self, names, db: Session):
+        return mask_from_names(names, self.bits(db))
+
+    def invalidate(self):
+        self._bits = None
+
+
+def load_genre_features(db: Session, movie_ids=None, n_bits: int = None):
+    """Retorna (ids, títulos, gêneros, matriz densa de features) dos filmes (todos, por padrão)."""
+    query = db.query(models.Movie.id, models.Movie.title, models.Movie.genres, models.Movie.genre_mask)
+    if movie_ids is not None:
+        query = query.filter(models.Movie.id.in_(movie_ids))
+    rows = query.order_by(models.Movie.id).all()
+    ids = np.fromiter((r.id for r in rows), dtype=np.int64, count=len(rows))
+    masks = np.fromiter((r.genre_mask or 0 for r in rows), dtype=np.int64, count=len(rows))
+    return ids, [r.title for r in rows], [r.genres for r in rows], genre_feature_matrix(masks, n_bits)
+
+
+genre_catalog = GenreCatalog()
@@ -0,0 +1,131 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow é opcional: sem ele só a variante "full" é gerada.
+    Image = None
+
+POSTER_CACHE_MAX_BYTES = int(os.getenv("POSTER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+POSTER_CACHE_MAX_AGE = int(os.getenv("POSTER_CACHE_MAX_AGE", "86400"))
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "92"))
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "75"))
+
+POSTER_VARIANTS = ("thumb", "full")
+
+_MAGIC_NUMBERS = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+    (b"RIFF", "image/webp"),
+]
+
+
+class Poster:
+    __slots__ = ("data", "media_type", "etag")
+
+    def __init__(self, data: bytes, media_type: str, etag: str):
+        self.data = data
+        self.media_type = media_type
+        self.etag = etag
+
+
+def detect_media_type(data: bytes) -> str:
+    for magic, media_type in _MAGIC_NUMBERS:
+        if data.startswith(magic):
+            return media_type
+    return "application/octet-stream"
+
+
+def decode_poster(image_base64: str) -> Poster:
+    """Decodifica o base64 armazenado no banco e calcula um ETag forte do conteúdo."""
+    if image_base64.startswith("data:"):
+        image_base64 = image_base64.split(",", 1)[-1]
+
+    try:
+        data = base64.b64decode(image_base64, validate=False)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Pôster com base64 inválido: {e}")
+
+    etag = f'"{hashlib.sha256(data).hexdigest()}"'
+    return Poster(data, detect_media_type(data), etag)
+
+
+def make_thumbnail(data: bytes, width: int = THUMBNAIL_WIDTH, quality: int = THUMBNAIL_QUALITY):
+    """JPEG reduzido para `width` px de largura, ou None se o Pillow não estiver instalado ou a imagem for ilegível."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert("RGB")
+            if image.width > width:
+                image = image.resize((width, max(round(image.height * width / image.width), 1)), Image.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=quality, optimize=True)
+    except (OSError, ValueError):
+        return None
+    return output.getvalue()
+
+
+def poster_variants(poster: Poster):
+    """Variantes binárias (nome, Poster) a armazenar para um pôster decodificado."""
+    variants = [("full", poster)]
+    thumbnail = make_thumbnail(poster.data)
+    if thumbnail is not None and len(thumbnail) < len(poster.data):
+        variants.append(("thumb", Poster(thumbnail, "image/jpeg", f'"{hashlib.sha256(thumbnail).hexdigest()}"')))
+    return variants
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Comparação fraca exigida pelo If-None-Match (RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class PosterCache:
+    """Cache LRU de pôsteres decodificados por (movie_id, variante), limitado pelo total de bytes em memória."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            poster = self._entries.get(key)
+            if poster is not None:
+                self._entries.move_to_end(key)
+            return poster
+
+    def put(self, key, poster: Poster):
+        size = len(poster.data)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous.data)
+
+            self._entries[key] = poster
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted.data)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+poster_cache = PosterCache(POSTER_CACHE_MAX_BYTES)
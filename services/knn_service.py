@@ -0,0 +1,244 @@
+import os
+import threading
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models
+from services.metrics import recommender_inference_seconds, recommender_train_seconds
+
+KNN_NEIGHBORS = int(os.getenv("KNN_NEIGHBORS", "4"))
+KNN_REBUILD_DRIFT = float(os.getenv("KNN_REBUILD_DRIFT", "0.05"))
+
+
+def build_rating_matrix(user_ids, movie_ids, ratings):
+    """Monta a matriz esparsa usuário × filme direto das colunas; votos repetidos mantêm o último."""
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    movie_ids = np.asarray(movie_ids, dtype=np.int64)
+    ratings = np.asarray(ratings, dtype=np.float32)
+
+    row_ids, rows = np.unique(user_ids, return_inverse=True)
+    col_ids, cols = np.unique(movie_ids, return_inverse=True)
+
+    # np.unique devolve a primeira ocorrência; invertendo a ordem ficamos com o voto mais recente.
+    keys = rows.astype(np.int64) * len(col_ids) + cols
+    _, last = np.unique(keys[::-1], return_index=True)
+    last = len(keys) - 1 - last
+
+    matrix = csr_matrix((ratings[last], (rows[last], cols[last])), shape=(len(row_ids), len(col_ids)), dtype=np.float32)
+    matrix.eliminate_zeros()
+    return matrix, row_ids, col_ids
+
+
+def _splice_rows(matrices, row_updates, shape):
+    """Substitui linhas de matrizes CSR com a mesma estrutura, copiando os trechos intactos em bloco.
+
+    `row_updates` mapeia linha → lista (uma por matriz) de (colunas, valores). Linhas além do
+    tamanho atual são novas.
+    """
+    indptr = matrices[0].indptr
+    n_old_rows = len(indptr) - 1
+    lengths = np.zeros(shape[0], dtype=np.int64)
+    lengths[:n_old_rows] = np.diff(indptr)
+
+    pieces = [([], []) for _ in matrices]
+    previous = 0
+    for row in sorted(row_updates):
+        untouched_end = indptr[min(row, n_old_rows)]
+        for (indices, data), matrix in zip(pieces, matrices):
+            indices.append(matrix.indices[indptr[previous]:untouched_end])
+            data.append(matrix.data[indptr[previous]:untouched_end])
+        for (indices, data), (cols, vals) in zip(pieces, row_updates[row]):
+            indices.append(cols)
+            data.append(vals)
+        lengths[row] = len(row_updates[row][0][0])
+        previous = min(row + 1, n_old_rows)
+
+    new_indptr = np.concatenate([[0], np.cumsum(lengths)])
+    result = []
+    for (indices, data), matrix in zip(pieces, matrices):
+        indices.append(matrix.indices[indptr[previous]:])
+        data.append(matrix.data[indptr[previous]:])
+        result.append(csr_matrix(
+            (np.concatenate(data).astype(np.float32), np.concatenate(indices).astype(np.int32), new_indptr),
+            shape=shape,
+        ))
+    return result
+
+
+class _KNNState:
+    __slots__ = ("ratings", "normalized", "user_ids", "movie_ids", "user_row", "movie_col", "built_nnz", "changes")
+
+    def __init__(self, ratings, user_ids, movie_ids, normalized=None, user_row=None, movie_col=None):
+        self.ratings = ratings
+        if normalized is None:
+            normalized = normalize(ratings, norm="l2", axis=1, copy=True) if ratings.shape[0] else ratings.copy()
+        self.normalized = normalized
+        self.user_ids = user_ids
+        self.movie_ids = movie_ids
+        self.user_row = user_row if user_row is not None else {int(user_id): row for row, user_id in enumerate(user_ids)}
+        self.movie_col = movie_col if movie_col is not None else {int(movie_id): col for col, movie_id in enumerate(movie_ids)}
+        self.built_nnz = ratings.nnz
+        self.changes = 0
+
+
+class UserKNNEngine:
+    """kNN usuário-usuário sobre uma matriz CSR com linhas normalizadas (cosseno = produto escalar).
+
+    O estado é trocado por inteiro a cada atualização, então leitores nunca veem uma matriz pela metade.
+    """
+
+    def __init__(self, n_neighbors: int = KNN_NEIGHBORS, rebuild_drift: float = KNN_REBUILD_DRIFT):
+        self.n_neighbors = n_neighbors
+        self.rebuild_drift = rebuild_drift
+        self.version = 0
+        self._state = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        state = self._state
+        return state is not None and len(state.user_ids) >= 2
+
+    def build(self, db: Session, chunk_size: int = 100_000):
+        with self._build_lock, recommender_train_seconds.time(model="knn"):
+            self._build(db, chunk_size)
+
+    def _build(self, db: Session, chunk_size: int = 100_000):
+        result = db.execute(
+            select(models.Rating.user_id, models.Rating.movie_id, models.Rating.rating)
+            .order_by(models.Rating.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        chunks = [np.array(partition, dtype=np.float64) for partition in result.partitions()]
+        columns = np.vstack(chunks) if chunks else np.empty((0, 3))
+        self.load_arrays(columns[:, 0].astype(np.int64), columns[:, 1].astype(np.int64), columns[:, 2])
+
+    def load_arrays(self, user_ids, movie_ids, ratings):
+        matrix, row_ids, col_ids = build_rating_matrix(user_ids, movie_ids, ratings)
+        state = _KNNState(matrix, row_ids, col_ids)
+        with self._lock:
+            self._state = state
+            self.version += 1
+
+    def ensure_built(self, db: Session):
+        """Constrói sob demanda, sem bloquear se outra thread (ex.: o consumidor) já estiver construindo."""
+        if self._state is None and self._build_lock.acquire(blocking=False):
+            try:
+                if self._state is None:
+                    self._build(db)
+            finally:
+                self._build_lock.release()
+
+    @property
+    def drift(self) -> float:
+        """Fração de células alteradas incrementalmente desde a última reconstrução completa."""
+        state = self._state
+        if state is None:
+            return 0.0
+        return state.changes / max(state.built_nnz, 1)
+
+    def needs_rebuild(self) -> bool:
+        return self._state is None or self.drift > self.rebuild_drift
+
+    def apply_events(self, events):
+        """Incorpora votos (user_id, movie_id, nota) reescrevendo só as linhas dos usuários afetados."""
+        with self._lock:
+            state = self._state
+            if state is None:
+                return
+
+            latest = {}
+            for user_id, movie_id, rating in events:
+                latest.setdefault(user_id, {})[movie_id] = float(rating)
+
+            user_ids, user_row = state.user_ids, state.user_row
+            new_users = [u for u in latest if u not in user_row]
+            if new_users:
+                user_row = dict(user_row)
+                for user_id in new_users:
+                    user_row[user_id] = len(user_row)
+                user_ids = np.concatenate([user_ids, np.array(new_users, dtype=np.int64)])
+
+            movie_ids, movie_col = state.movie_ids, state.movie_col
+            new_movies = sorted({m for votes in latest.values() for m in votes if m not in movie_col})
+            if new_movies:
+                movie_col = dict(movie_col)
+                for movie_id in new_movies:
+                    movie_col[movie_id] = len(movie_col)
+                movie_ids = np.concatenate([movie_ids, np.array(new_movies, dtype=np.int64)])
+
+            ratings = state.ratings
+            row_updates = {}
+            for user_id, votes in latest.items():
+                row = user_row[user_id]
+                current = {}
+                if row < ratings.shape[0]:
+                    start, end = ratings.indptr[row], ratings.indptr[row + 1]
+                    current = dict(zip(ratings.indices[start:end].tolist(), ratings.data[start:end].tolist()))
+                for movie_id, rating in votes.items():
+                    if rating:
+                        current[movie_col[movie_id]] = rating
+                    else:
+                        current.pop(movie_col[movie_id], None)
+
+                cols = np.array(sorted(current), dtype=np.int32)
+                vals = np.array([current[c] for c in cols.tolist()], dtype=np.float32)
+                norm = np.linalg.norm(vals)
+                row_updates[row] = [(cols, vals), (cols, vals / norm if norm else vals)]
+
+            shape = (len(user_ids), len(movie_ids))
+            new_ratings, new_normalized = _splice_rows([state.ratings, state.normalized], row_updates, shape)
+
+            new_state = _KNNState(new_ratings, user_ids, movie_ids, new_normalized, user_row, movie_col)
+            new_state.built_nnz = state.built_nnz
+            new_state.changes = state.changes + sum(len(votes) for votes in latest.values())
+            self._state = new_state
+
+    def _neighbors(self, state: _KNNState, row: int):
+        """Linhas dos `n_neighbors` usuários mais similares (excluindo o próprio)."""
+        similarity = (state.normalized @ state.normalized[row].T).toarray().ravel()
+        similarity[row] = -np.inf
+        k = min(self.n_neighbors, len(similarity) - 1)
+        candidates = np.argpartition(-similarity, k - 1)[:k]
+        return candidates[np.lexsort((candidates, -similarity[candidates]))]
+
+    def recommend(self, user_id: int, exclude_movie_ids=(), n: int = 5):
+        """IDs dos filmes com maior nota média entre os vizinhos, ou None se o usuário não estiver na matriz."""
+        with recommender_inference_seconds.time(model="knn"):
+            return self._recommend(user_id, exclude_movie_ids, n)
+
+    def _recommend(self, user_id: int, exclude_movie_ids, n: int):
+        state = self._state
+        row = state.user_row.get(user_id) if state is not None else None
+        if row is None or len(state.user_ids) < 2:
+            return None
+
+        neighbor_rows = self._neighbors(state, row)
+        scores = np.asarray(state.ratings[neighbor_rows].mean(axis=0)).ravel()
+
+        excluded = [state.movie_col[m] for m in exclude_movie_ids if m in state.movie_col]
+        scores[excluded] = -np.inf
+
+        n = min(n, int(np.isfinite(scores).sum()))
+        if n <= 0:
+            return []
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.lexsort((top, -scores[top]))]
+        return state.movie_ids[top].tolist()
+
+    def memory_bytes(self) -> int:
+        state = self._state
+        if state is None:
+            return 0
+        total = state.user_ids.nbytes + state.movie_ids.nbytes
+        for matrix in (state.ratings, state.normalized):
+            total += matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        return total
+
+
+user_knn_engine = UserKNNEngine()
@@ -0,0 +1,318 @@
+"""Métricas em memória expostas em /metrics no formato texto do Prometheus.
+
+O middleware abre um `RequestStats` por requisição em uma ContextVar; os hooks de cursor do SQLAlchemy somam
+nele as instruções, linhas e tempo de banco (threads do pool do AnyIO herdam o contexto). SQL executado fora
+de requisições (treino, pipeline de votos) entra só nos totais globais.
+"""
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+SLOW_REQUEST_TOP_STATEMENTS = int(os.getenv("SLOW_REQUEST_TOP_STATEMENTS", "10"))
+SLOW_REQUEST_MAX_DISTINCT = 200
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10_000, 100_000, 1_000_000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, [le])} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+class GaugeFunction:
+    """Gauge lido na hora da coleta: `read()` retorna {valores dos rótulos: valor}."""
+
+    def __init__(self, name: str, documentation: str, labelnames, read):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.read = read
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        for key, value in sorted(self.read().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_function(self, name, documentation, labelnames, read):
+        return self.register(GaugeFunction(name, documentation, labelnames, read))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+metrics = MetricsRegistry()
+
+request_latency = metrics.histogram(
+    "flix_http_request_duration_seconds", "Latência das requisições HTTP por rota.", ["method", "route", "status"])
+request_sql_statements = metrics.histogram(
+    "flix_http_request_sql_statements", "Instruções SQL executadas por requisição.", ["method", "route"], COUNT_BUCKETS)
+request_sql_rows = metrics.histogram(
+    "flix_http_request_sql_rows", "Linhas retornadas/afetadas pelo SQL por requisição.", ["method", "route"], ROW_BUCKETS)
+request_db_seconds = metrics.histogram(
+    "flix_http_request_db_seconds", "Tempo gasto no banco por requisição.", ["method", "route"])
+sql_statements_total = metrics.counter(
+    "flix_sql_statements_total", "Instruções SQL executadas (origin=request|background).", ["engine", "origin"])
+sql_seconds_total = metrics.counter(
+    "flix_sql_seconds_total", "Tempo total em instruções SQL.", ["engine", "origin"])
+pool_checkout_wait = metrics.histogram(
+    "flix_db_pool_checkout_wait_seconds", "Espera por uma conexão do pool (inclui abrir conexões novas).", ["pool"])
+recommender_train_seconds = metrics.histogram(
+    "flix_recommender_train_seconds", "Duração do treino/construção dos recomendadores.", ["model"],
+    (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+recommender_inference_seconds = metrics.histogram(
+    "flix_recommender_inference_seconds", "Duração de uma inferência do recomendador.", ["model"])
+
+
+def process_memory():
+    """RSS atual (via /proc, no Linux) e pico do processo, em bytes; vazio onde não houver como medir."""
+    values = {}
+    if resource is not None:
+        # ru_maxrss vem em KiB no Linux.
+        values[("peak_resident",)] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    try:
+        with open("/proc/self/statm") as statm:
+            values[("resident",)] = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    return values
+
+
+metrics.gauge_function("flix_process_memory_bytes", "Memória do processo da API.", ["kind"], process_memory)
+
+
+class RequestStats:
+    __slots__ = ("statements", "rows", "db_seconds", "pool_wait_seconds", "captured")
+
+    def __init__(self, capture: bool = False):
+        self.statements = 0
+        self.rows = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        # {sql: [execuções, segundos]}; só preenchido com o log de requisições lentas ligado.
+        self.captured = {} if capture else None
+
+    def record(self, statement: str, elapsed: float, rows: int):
+        self.statements += 1
+        self.db_seconds += elapsed
+        self.rows += max(rows, 0)
+        if self.captured is not None:
+            entry = self.captured.get(statement)
+            if entry is None:
+                if len(self.captured) >= SLOW_REQUEST_MAX_DISTINCT:
+                    return
+                entry = self.captured[statement] = [0, 0.0]
+            entry[0] += 1
+            entry[1] += elapsed
+
+
+_current_request: ContextVar = ContextVar("flix_request_stats", default=None)
+
+
+def instrument_engine(engine, name: str):
+    """Liga os hooks de cursor em `engine` (para engines assíncronos, passe `async_engine.sync_engine`)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("flix_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["flix_query_started"].pop()
+        stats = _current_request.get()
+        origin = "request" if stats is not None else "background"
+        sql_statements_total.inc(engine=name, origin=origin)
+        sql_seconds_total.inc(elapsed, engine=name, origin=origin)
+        if stats is not None:
+            stats.record(statement, elapsed, cursor.rowcount if cursor.rowcount is not None else 0)
+
+    def pool_connections():
+        pool = engine.pool
+        if not hasattr(pool, "checkedout"):
+            return {}
+        return {(name, "checked_out"): pool.checkedout(), (name, "idle"): pool.checkedin()}
+
+    metrics.gauge_function("flix_db_pool_connections", "Conexões do pool por estado.", ["pool", "state"], pool_connections)
+
+
+def timed_pool(pool_class, name: str):
+    """Subclasse de `pool_class` que mede a espera no checkout (global e na requisição atual)."""
+
+    class TimedPool(pool_class):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                waited = time.perf_counter() - started
+                pool_checkout_wait.observe(waited, pool=name)
+                stats = _current_request.get()
+                if stats is not None:
+                    stats.pool_wait_seconds += waited
+
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+
+def route_label(scope) -> str:
+    """Template da rota ("/movies/{movie_id}") para não criar uma série por URL."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def log_slow_request(method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+    print(
+        f"🐢 {method} {route} -> {status} em {elapsed * 1000:.0f}ms: {stats.statements} SQL "
+        f"({stats.db_seconds * 1000:.0f}ms no banco, {stats.pool_wait_seconds * 1000:.0f}ms esperando o pool, {stats.rows} linhas)"
+    )
+    top = sorted(stats.captured.items(), key=lambda item: item[1][1], reverse=True)[:SLOW_REQUEST_TOP_STATEMENTS]
+    for statement, (count, seconds) in top:
+        # A mesma instrução repetida várias vezes na requisição costuma ser um N+1.
+        print(f"   {count:>4}x {seconds * 1000:>8.1f}ms  {_WHITESPACE.sub(' ', statement)[:300]}")
+
+
+class RequestMetricsMiddleware:
+    """Middleware ASGI: latência por rota e SQL por requisição; com SLOW_REQUEST_MS > 0, loga as lentas."""
+
+    def __init__(self, app, slow_request_ms: float = SLOW_REQUEST_MS):
+        self.app = app
+        self.slow_request_seconds = slow_request_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(capture=self.slow_request_seconds > 0)
+        token = _current_request.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_request.reset(token)
+            method, route = scope["method"], route_label(scope)
+            request_latency.observe(elapsed, method=method, route=route, status=status)
+            request_sql_statements.observe(stats.statements, method=method, route=route)
+            request_sql_rows.observe(stats.rows, method=method, route=route)
+            request_db_seconds.observe(stats.db_seconds, method=method, route=route)
+            if self.slow_request_seconds and elapsed >= self.slow_request_seconds:
+                log_slow_request(method, route, status, elapsed, stats)
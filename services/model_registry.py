@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+
+from app.database import SessionLocal
+from services.metrics import recommender_train_seconds
+
+MODEL_RETRAIN_SECONDS = int(os.getenv("MODEL_RETRAIN_SECONDS", "3600"))
+MODEL_MIN_RETRAIN_SECONDS = int(os.getenv("MODEL_MIN_RETRAIN_SECONDS", "60"))
+
+
+class ModelVersion:
+    __slots__ = ("version", "model", "trained_at", "train_seconds", "n_ratings")
+
+    def __init__(self, version: int, model, trained_at: float, train_seconds: float, n_ratings: int):
+        self.version = version
+        self.model = model
+        self.trained_at = trained_at
+        self.train_seconds = train_seconds
+        self.n_ratings = n_ratings
+
+    def age(self) -> float:
+        return time.time() - self.trained_at
+
+
+class ModelRegistry:
+    """Treina modelos em uma thread de fundo e troca a versão servida de forma atômica.
+
+    `train_fn(db)` deve retornar `(modelo, n_avaliações)` ou None quando não houver dados suficientes.
+    Enquanto uma nova versão treina, as requisições continuam usando a versão anterior.
+    """
+
+    def __init__(self, name: str, train_fn, retrain_seconds: int = MODEL_RETRAIN_SECONDS, min_retrain_seconds: int = MODEL_MIN_RETRAIN_SECONDS):
+        self.name = name
+        self.train_fn = train_fn
+        self.retrain_seconds = retrain_seconds
+        self.min_retrain_seconds = min_retrain_seconds
+        self.retrain_pending = False
+        self.training = False
+        self.last_error = None
+        self._current = None
+        self._next_version = 1
+        self._train_lock = threading.Lock()
+        self._request_lock = threading.Lock()
+        self._last_request = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self):
+        return self._current
+
+    def train_now(self):
+        """Treina uma nova versão de forma síncrona; retorna a versão publicada (ou None)."""
+        with self._train_lock:
+            self.training = True
+            db = SessionLocal()
+            started = time.perf_counter()
+            try:
+                result = self.train_fn(db)
+                if result is None:
+                    print(f"⚠️ [{self.name}] Dados insuficientes para treinar o modelo.")
+                    return None
+
+                model, n_ratings = result
+                version = ModelVersion(self._next_version, model, time.time(), time.perf_counter() - started, n_ratings)
+                recommender_train_seconds.observe(version.train_seconds, model=self.name)
+                self._next_version += 1
+                self._current = version
+                self.last_error = None
+                print(f"✅ [{self.name}] Modelo v{version.version} treinado em {version.train_seconds:.1f}s com {n_ratings} avaliações.")
+                return version
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ [{self.name}] Erro ao treinar o modelo: {e}")
+                return None
+            finally:
+                db.close()
+                SessionLocal.remove()
+                self.training = False
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._request_lock:
+                # Pedidos feitos a partir daqui (inclusive durante o treino) enfileiram um novo treino.
+                self.retrain_pending = False
+            self.train_now()
+            self._wake.wait(self.retrain_seconds)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-trainer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def retry_after(self) -> float:
+        """Segundos até aceitar um novo pedido de retreino (0 se já pode)."""
+        if self._last_request is None:
+            return 0.0
+        return max(self.min_retrain_seconds - (time.monotonic() - self._last_request), 0.0)
+
+    def request_retrain(self) -> bool:
+        """Acorda o worker para treinar, sem bloquear a requisição.
+
+        Pedidos que chegam com um retreino já na fila (ex.: durante um treino) são agrupados nele; retorna
+        False nesse caso.
+        """
+        with self._request_lock:
+            if self.retrain_pending:
+                return False
+            self.retrain_pending = True
+            self._last_request = time.monotonic()
+        self._wake.set()
+        return True
+
+    def status(self):
+        current = self._current
+        return {
+            "name": self.name,
+            "version": current.version if current else None,
+            "trained_at": current.trained_at if current else None,
+            "age_seconds": round(current.age(), 3) if current else None,
+            "train_seconds": round(current.train_seconds, 3) if current else None,
+            "n_ratings": current.n_ratings if current else None,
+            "training": self.training,
+            "retrain_pending": self.retrain_pending,
+            "retrain_seconds": self.retrain_seconds,
+            "min_retrain_seconds": self.min_retrain_seconds,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,125 @@
+import csv
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+ENCODING = "ISO-8859-1"
+
+# Separador de um byte que não aparece nos arquivos do MovieLens; o "::" é reescrito para ele em stream.
+_FIELD_SEPARATOR = b"\x1f"
+_READ_CHUNK = 1 << 20
+
+MOVIE_DTYPES = {"id": np.int32, "title": str, "genres": str}
+USER_DTYPES = {"id": np.int32, "gender": str, "age": np.int8, "occupation": np.int8, "zip_code": str}
+RATING_DTYPES = {"user_id": np.int32, "movie_id": np.int32, "rating": np.float32, "timestamp": np.int64}
+
+_CSV_COLUMNS = {
+    "movies": {"movieId": "id", "title": "title", "genres": "genres"},
+    "ratings": {"userId": "user_id", "movieId": "movie_id", "rating": "rating", "timestamp": "timestamp"},
+}
+
+
+class DoubleColonReader(io.RawIOBase):
+    """Arquivo binário que entrega o conteúdo de `raw` com cada "::" trocado por um separador de um byte.
+
+    Permite usar o parser em C do pandas (que só aceita separadores de um caractere) sem carregar o arquivo
+    inteiro em memória. Um ":" no fim de um bloco fica retido até o próximo, para não partir um "::" ao meio.
+    """
+
+    def __init__(self, raw, chunk_size: int = _READ_CHUNK):
+        self._raw = raw
+        self._chunk_size = chunk_size
+        self._pending = b""
+        self._carry = b""
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        while not self._pending and not self._eof:
+            chunk = self._raw.read(self._chunk_size)
+            self._eof = not chunk
+            pending = (self._carry + chunk).replace(b"::", _FIELD_SEPARATOR)
+            self._carry = b""
+            if not self._eof and pending.endswith(b":"):
+                pending, self._carry = pending[:-1], b":"
+            self._pending = pending
+
+    def readinto(self, buffer):
+        self._fill()
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        self._raw.close()
+        super().close()
+
+
+def read_double_colon(path: str, columns, dtypes):
+    """Lê um arquivo "::" do MovieLens com o engine C e dtypes explícitos."""
+    with open(path, "rb") as raw, io.BufferedReader(DoubleColonReader(raw)) as stream:
+        return pd.read_csv(
+            stream,
+            sep=_FIELD_SEPARATOR.decode(),
+            names=columns,
+            header=None,
+            dtype=dtypes,
+            engine="c",
+            quoting=csv.QUOTE_NONE,
+            encoding=ENCODING,
+        )
+
+
+def read_movielens_csv(path: str, kind: str, dtypes):
+    """Lê o layout CSV com cabeçalho (ML-20M em diante), renomeando as colunas para as do ML-1M."""
+    renames = _CSV_COLUMNS[kind]
+    frame = pd.read_csv(path, usecols=list(renames), dtype={source: dtypes[target] for source, target in renames.items()}, engine="c")
+    return frame.rename(columns=renames)
+
+
+def detect_layout(directory: str):
+    """Retorna ("dat" | "csv", caminhos) conforme os arquivos presentes (ML-1M/ML-10M usam .dat; ML-20M, .csv)."""
+    for extension in ("dat", "csv"):
+        paths = {name: os.path.join(directory, f"{name}.{extension}") for name in ("movies", "users", "ratings")}
+        if os.path.exists(paths["movies"]) and os.path.exists(paths["ratings"]):
+            if not os.path.exists(paths["users"]):
+                paths["users"] = None
+            return extension, paths
+    raise FileNotFoundError(f"ERRO: Arquivos do MovieLens não encontrados em `{directory}`!")
+
+
+def users_from_ratings(ratings: pd.DataFrame) -> pd.DataFrame:
+    """ML-10M e ML-20M não trazem users.dat; cria usuários anônimos para os ids presentes nas avaliações."""
+    ids = np.unique(ratings["user_id"].to_numpy())
+    return pd.DataFrame({
+        "id": ids.astype(np.int32),
+        "gender": "N/A",
+        "age": np.zeros(len(ids), dtype=np.int8),
+        "occupation": np.zeros(len(ids), dtype=np.int8),
+        "zip_code": "00000",
+    })
+
+
+def read_movielens(directory: str):
+    """Lê filmes, usuários e avaliações de um diretório MovieLens (ML-1M, ML-10M ou ML-20M)."""
+    layout, paths = detect_layout(directory)
+
+    if layout == "dat":
+        movies = read_double_colon(paths["movies"], list(MOVIE_DTYPES), MOVIE_DTYPES)
+        ratings = read_double_colon(paths["ratings"], list(RATING_DTYPES), RATING_DTYPES)
+    else:
+        movies = read_movielens_csv(paths["movies"], "movies", MOVIE_DTYPES)
+        ratings = read_movielens_csv(paths["ratings"], "ratings", RATING_DTYPES)
+
+    if layout == "dat" and paths["users"] is not None:
+        users = read_double_colon(paths["users"], list(USER_DTYPES), USER_DTYPES)
+    else:
+        users = users_from_ratings(ratings)
+
+    ratings["timestamp"] = pd.to_datetime(ratings["timestamp"], unit="s", utc=True)
+    return movies, users, ratings
@@ -0,0 +1,22 @@
+import base64
+import binascii
+import json
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(payload: dict) -> str:
+    """Serializa a posição da última linha entregue em um cursor opaco (base64 URL-safe)."""
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    padding = "=" * (-len(cursor) % 4)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Cursor inválido: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError("Cursor inválido.")
+    return payload
@@ -0,0 +1,110 @@
+import bisect
+import os
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from app import models
+
+POPULARITY_REFRESH_SECONDS = int(os.getenv("POPULARITY_REFRESH_SECONDS", "60"))
+POPULARITY_REFRESH_VOTES = int(os.getenv("POPULARITY_REFRESH_VOTES", "500"))
+POPULARITY_MAX_STALENESS_SECONDS = int(os.getenv("POPULARITY_MAX_STALENESS_SECONDS", "300"))
+POPULARITY_MIN_REBUILD_SECONDS = int(os.getenv("POPULARITY_MIN_REBUILD_SECONDS", "10"))
+
+
+class _Ranking:
+    __slots__ = ("entries", "keys", "built_at")
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.keys = [(-count, -avg, movie_id) for movie_id, count, avg in entries]
+        self.built_at = time.time()
+
+
+class PopularityRanking:
+    """Ranking de popularidade (movie_id, contagem, média) mantido em memória e servido em fatias."""
+
+    def __init__(
+        self,
+        refresh_seconds: int = POPULARITY_REFRESH_SECONDS,
+        refresh_votes: int = POPULARITY_REFRESH_VOTES,
+        max_staleness_seconds: int = POPULARITY_MAX_STALENESS_SECONDS,
+        min_rebuild_seconds: int = POPULARITY_MIN_REBUILD_SECONDS,
+    ):
+        self.refresh_seconds = refresh_seconds
+        self.refresh_votes = refresh_votes
+        self.max_staleness_seconds = max_staleness_seconds
+        self.min_rebuild_seconds = min_rebuild_seconds
+        self.pending_votes = 0
+        self._ranking = None
+        self._lock = threading.Lock()
+
+    def rebuild(self, db: Session):
+        # Só é chamado por rotas síncronas (threadpool), onde esperar pelo lock não trava o event loop.
+        with self._lock:
+            self._rebuild(db)
+        return self.status()
+
+    def _fetch(self, db: Session) -> _Ranking:
+        rows = (
+            db.query(models.Movie.id, models.Movie.rating_count, models.Movie.avg_rating)
+            .filter(models.Movie.rating_count > 0)
+            .order_by(models.Movie.rating_count.desc(), models.Movie.avg_rating.desc(), models.Movie.id)
+            .all()
+        )
+        return _Ranking([tuple(row) for row in rows])
+
+    def _rebuild(self, db: Session):
+        self.pending_votes = 0
+        self._ranking = self._fetch(db)
+
+    def age(self) -> float:
+        return time.time() - self._ranking.built_at if self._ranking else float("inf")
+
+    def note_vote(self):
+        self.pending_votes += 1
+
+    def _current(self, db: Session) -> _Ranking:
+        """Garante o limite de staleness sem nunca esperar pelo lock.
+
+        `page` roda em greenlets no event loop (via `run_sync`): bloquear no lock enquanto outra requisição
+        consulta o banco travaria o loop inteiro. Só quem pega o lock reconstrói; as demais servem o ranking
+        atual ou, se ele não existir ou estiver velho demais, consultam um ranking avulso sem guardá-lo.
+        """
+        age = self.age()
+
+        if age > self.refresh_seconds or self.pending_votes >= self.refresh_votes:
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._rebuild(db)
+                finally:
+                    self._lock.release()
+            elif age > self.max_staleness_seconds:
+                return self._fetch(db)
+
+        return self._ranking
+
+    def page(self, db: Session, offset: int = 0, limit: int = 10, after=None):
+        """Fatia do ranking a partir de `offset` ou logo após o cursor `(contagem, média, movie_id)`."""
+        ranking = self._current(db)
+        if after is not None:
+            count, avg, movie_id = after
+            offset = bisect.bisect_right(ranking.keys, (-count, -avg, movie_id))
+        return ranking.entries[offset:offset + limit]
+
+    def status(self):
+        ranking = self._ranking
+        return {
+            "size": len(ranking.entries) if ranking else 0,
+            "built_at": ranking.built_at if ranking else None,
+            "age_seconds": round(self.age(), 3) if ranking else None,
+            "pending_votes": self.pending_votes,
+            "refresh_seconds": self.refresh_seconds,
+            "refresh_votes": self.refresh_votes,
+            "max_staleness_seconds": self.max_staleness_seconds,
+            "min_rebuild_seconds": self.min_rebuild_seconds,
+        }
+
+
+popularity_ranking = PopularityRanking()
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from collections import deque
+
+from app.database import SessionLocal
+from services.knn_service import UserKNNEngine, user_knn_engine
+from services.recommendation_cache import recommendation_cache
+
+RATING_EVENTS_MAX = int(os.getenv("RATING_EVENTS_MAX", "100000"))
+RATING_EVENTS_POLL_SECONDS = float(os.getenv("RATING_EVENTS_POLL_SECONDS", "1"))
+
+
+class RatingEventLog:
+    """Fila em memória de votos (user_id, movie_id, nota) aguardando o consumidor.
+
+    Se a fila transbordar, os eventos mais antigos são descartados e o consumidor é avisado
+    para reconstruir a matriz a partir do banco.
+    """
+
+    def __init__(self, max_events: int = RATING_EVENTS_MAX):
+        self._events = deque()
+        self.max_events = max_events
+        self.overflowed = False
+        self.appended = 0
+        self._condition = threading.Condition()
+
+    def append(self, user_id: int, movie_id: int, rating: float):
+        with self._condition:
+            if len(self._events) >= self.max_events:
+                self._events.popleft()
+                self.overflowed = True
+            self._events.append((int(user_id), int(movie_id), float(rating)))
+            self.appended += 1
+            self._condition.notify()
+
+    def drain(self, timeout: float = None):
+        """Espera até `timeout` segundos por eventos e devolve todos os pendentes (e se houve transbordo)."""
+        with self._condition:
+            if not self._events:
+                self._condition.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            overflowed, self.overflowed = self.overflowed, False
+        return events, overflowed
+
+    def wake(self):
+        with self._condition:
+            self._condition.notify_all()
+
+    def __len__(self):
+        return len(self._events)
+
+
+class RatingEventConsumer:
+    """Thread que aplica os votos no kNN linha a linha e só reconstrói tudo além do limite de drift."""
+
+    def __init__(self, log: RatingEventLog, engine: UserKNNEngine, poll_seconds: float = RATING_EVENTS_POLL_SECONDS):
+        self.log = log
+        self.engine = engine
+        self.poll_seconds = poll_seconds
+        self.applied = 0
+        self.rebuilds = 0
+        self.last_applied_at = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def rebuild(self):
+        db = SessionLocal()
+        try:
+            self.engine.build(db)
+            self.rebuilds += 1
+            print(f"🔁 Matriz do kNN reconstruída ({self.engine.memory_bytes() / 2**20:.1f} MiB).")
+        finally:
+            db.close()
+            SessionLocal.remove()
+
+    def consume_once(self, timeout: float = 0):
+        """Processa o lote pendente; retorna quantos eventos foram aplicados."""
+        events, overflowed = self.log.drain(timeout)
+        if overflowed or (events and self.engine.needs_rebuild()):
+            # A reconstrução lê o banco, que já contém os votos drenados.
+            self.rebuild()
+        elif events:
+            self.engine.apply_events(events)
+            # O pipeline invalidou no commit, mas uma leitura feita antes deste ponto recalculou com a matriz
+            # antiga e regravou sob a mesma versão do kNN; agora a matriz já reflete os votos.
+            for user_id in {user_id for user_id, _, _ in events}:
+                recommendation_cache.invalidate(user_id)
+            if self.engine.needs_rebuild():
+                self.rebuild()
+        if events:
+            self.applied += len(events)
+            self.last_applied_at = time.time()
+        return len(events)
+
+    def _run(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"❌ Erro ao construir a matriz do kNN: {e}")
+
+        while not self._stop.is_set():
+            try:
+                self.consume_once(self.poll_seconds)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Erro ao aplicar eventos de avaliação: {e}")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rating-events", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.log.wake()
+
+    def status(self):
+        return {
+            "pending": len(self.log),
+            "appended": self.log.appended,
+            "applied": self.applied,
+            "rebuilds": self.rebuilds,
+            "drift": round(self.engine.drift, 4),
+            "rebuild_drift": self.engine.rebuild_drift,
+            "last_applied_at": self.last_applied_at,
+            "last_error": self.last_error,
+        }
+
+
+rating_event_log = RatingEventLog()
+rating_event_consumer = RatingEventConsumer(rating_event_log, user_knn_engine)
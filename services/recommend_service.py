@@ -1,49 +1,112 @@
+import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from sqlalchemy.orm import Session
 from app import models
+from services.similarity_service import movie_similarity_index
+from services.metrics import recommender_inference_seconds
+from services.model_registry import ModelRegistry
 from surprise import Dataset, Reader, SVD
-from surprise.model_selection import train_test_split
 
-def get_movie_recommendations(movie_id: int, db: Session):
+def get_movie_recommendations(movie_id: int, db: Session, n: int = 5):
     """🔍 Retorna recomendações baseadas no conteúdo do filme."""
-    movies = db.query(models.Movie).all()
-    df = pd.DataFrame([{"id": m.id, "title": m.title, "genres": m.genres} for m in movies])
-
-    if movie_id not in df["id"].values:
+    movie_similarity_index.refresh_if_changed(db)
+    similar = movie_similarity_index.similar_to(movie_id, n)
+    if not similar:
         return []
 
-    tfidf = TfidfVectorizer(stop_words="english")
-    tfidf_matrix = tfidf.fit_transform(df["genres"].fillna(""))
+    similar_ids = [similar_id for similar_id, _ in similar]
+    rows = db.query(models.Movie.id, models.Movie.title, models.Movie.genres).filter(models.Movie.id.in_(similar_ids)).all()
+    rows_by_id = {row.id: row for row in rows}
+
+    return [
+        {"id": row.id, "title": row.title, "genres": row.genres}
+        for row in (rows_by_id.get(similar_id) for similar_id in similar_ids)
+        if row is not None
+    ]
+
+class SVDFactors:
+    """Fatores do SVD (pu, qi, bu, bi) exportados para NumPy, para pontuar usuários com álgebra matricial."""
 
-    cosine_sim = cosine_similarity(tfidf_matrix, tfidf_matrix)
-    idx = df.index[df["id"] == movie_id].tolist()[0]
+    def __init__(self, model):
+        trainset = model.trainset
+        self.global_mean = np.float32(trainset.global_mean)
+        self.low, self.high = trainset.rating_scale
+        self.pu = model.pu.astype(np.float32)
+        self.qi = model.qi.astype(np.float32)
+        self.bu = model.bu.astype(np.float32)
+        self.bi = model.bi.astype(np.float32)
+        self.user_row = {trainset.to_raw_uid(inner): inner for inner in trainset.all_users()}
+        self.item_ids = np.array([trainset.to_raw_iid(inner) for inner in trainset.all_items()], dtype=np.int64)
+        self.item_col = {int(raw): col for col, raw in enumerate(self.item_ids)}
 
-    sim_scores = list(enumerate(cosine_sim[idx]))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)[1:6]
-    movie_indices = [i[0] for i in sim_scores]
+    def score(self, user_ids):
+        """Matriz (usuários × itens) de notas previstas, equivalente a `SVD.predict` para cada par."""
+        rows = [self.user_row.get(user_id) for user_id in user_ids]
+        known = np.array([row is not None for row in rows])
+        known_rows = np.array([row for row in rows if row is not None], dtype=np.int64)
 
-    return df.iloc[movie_indices].to_dict(orient="records")
+        scores = np.empty((len(rows), len(self.item_ids)), dtype=np.float32)
+        scores[:] = self.global_mean + self.bi
+        if known_rows.size:
+            scores[known] += self.bu[known_rows, None] + self.pu[known_rows] @ self.qi.T
+        return np.clip(scores, self.low, self.high, out=scores)
+
+def top_n_excluding(scores, excluded_cols, n: int):
+    """Top-N de uma linha via argpartition, ignorando as colunas já avaliadas."""
+    scores = scores.copy()
+    if excluded_cols:
+        scores[list(excluded_cols)] = -np.inf
+    n = min(n, int(np.isfinite(scores).sum()))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, n - 1)[:n]
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
 
 def train_collaborative_model(db: Session):
-    ratings = db.query(models.Rating).all()
-    df = pd.DataFrame([{"user_id": r.user_id, "movie_id": r.movie_id, "rating": r.rating} for r in ratings])
+    """Treina o SVD com todas as avaliações; retorna (fatores, n_avaliações) ou None."""
+    ratings = db.query(models.Rating.user_id, models.Rating.movie_id, models.Rating.rating).all()
+    df = pd.DataFrame(ratings, columns=["user_id", "movie_id", "rating"])
 
     if df.empty:
         return None
 
+    df["rating"] = df["rating"].astype(float)
     reader = Reader(rating_scale=(0, 5))
     data = Dataset.load_from_df(df[["user_id", "movie_id", "rating"]], reader)
-    trainset, _ = train_test_split(data, test_size=0.2)
+    trainset = data.build_full_trainset()
     model = SVD()
     model.fit(trainset)
 
-    return model
+    return SVDFactors(model), trainset.n_ratings
+
+def get_batch_user_recommendations(user_ids, db: Session, factors: SVDFactors, n: int = 5, chunk_size: int = 256):
+    """Recomenda para vários usuários com um produto matriz-matriz por bloco e uma busca de títulos."""
+    rated = {}
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        for user_id, movie_id in db.query(models.Rating.user_id, models.Rating.movie_id).filter(models.Rating.user_id.in_(chunk)):
+            col = factors.item_col.get(movie_id)
+            if col is not None:
+                rated.setdefault(user_id, set()).add(col)
+
+    top_ids = {}
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        scores = factors.score(chunk)
+        for row, user_id in enumerate(chunk):
+            cols = top_n_excluding(scores[row], rated.get(user_id), n)
+            top_ids[user_id] = factors.item_ids[cols].tolist()
+
+    all_ids = {movie_id for ids in top_ids.values() for movie_id in ids}
+    titles = dict(db.query(models.Movie.id, models.Movie.title).filter(models.Movie.id.in_(all_ids)).all()) if all_ids else {}
+
+    return {
+        user_id: [{"id": movie_id, "title": titles[movie_id]} for movie_id in ids if movie_id in titles]
+        for user_id, ids in top_ids.items()
+    }
+
+def get_user_recommendations(user_id: int, db: Session, factors: SVDFactors, n: int = 5):
+    with recommender_inference_seconds.time(model="svd"):
+        return get_batch_user_recommendations([user_id], db, factors, n)[user_id]
 
-def get_user_recommendations(user_id: int, db: Session, model):
-    movies = db.query(models.Movie).all()
-    predictions = [(m.id, model.predict(user_id, m.id).est) for m in movies]
-    predictions.sort(key=lambda x: x[1], reverse=True)
-    return [{"id": movie_id, "title": db.query(models.Movie).filter(models.Movie.id == movie_id).first().title}
-            for movie_id, _ in predictions[:5]]
+collaborative_registry = ModelRegistry("svd", train_collaborative_model)
@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RECOMMENDATION_CACHE_TTL_SECONDS = int(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", "300"))
+RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", "10000"))
+RECOMMENDATION_CACHE_URL = os.getenv("RECOMMENDATION_CACHE_URL")
+
+
+class CacheBackend:
+    """Armazenamento das listas renderizadas, agrupadas por usuário.
+
+    Cada usuário tem vários campos (escopo + versão do modelo), para que `delete(user_id)` invalide
+    todas as variantes com uma única operação.
+    """
+
+    def get(self, user_id: int, field: str):
+        raise NotImplementedError
+
+    def set(self, user_id: int, field: str, value, ttl: float):
+        raise NotImplementedError
+
+    def delete(self, user_id: int):
+        raise NotImplementedError
+
+
+class LocalCacheBackend(CacheBackend):
+    """LRU + TTL em memória, local ao processo; também serve de substituto do backend compartilhado em testes."""
+
+    def __init__(self, max_entries: int = RECOMMENDATION_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._fields = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, field: str):
+        key = (user_id, field)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, user_id: int, field: str, value, ttl: float):
+        key = (user_id, field)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            self._fields.setdefault(user_id, set()).add(field)
+
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._forget(evicted)
+
+    def delete(self, user_id: int):
+        with self._lock:
+            for field in self._fields.pop(user_id, ()):
+                self._entries.pop((user_id, field), None)
+
+    def _remove(self, key):
+        del self._entries[key]
+        self._forget(key)
+
+    def _forget(self, key):
+        user_id, field = key
+        fields = self._fields.get(user_id)
+        if fields is not None:
+            fields.discard(field)
+            if not fields:
+                del self._fields[user_id]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Backend compartilhado entre workers do uvicorn: um hash por usuário, valores em JSON.
+
+    O Redis só expira a chave inteira, então o prazo de cada campo vai junto do valor e é conferido na leitura.
+    """
+
+    def __init__(self, url: str, prefix: str = "flix:recommend"):
+        import redis
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.prefix}:{user_id}"
+
+    def get(self, user_id: int, field: str):
+        raw = self._client.hget(self._key(user_id), field)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if entry["expires_at"] <= time.time():
+            return None
+        return entry["value"]
+
+    def set(self, user_id: int, field: str, value, ttl: float):
+        key = self._key(user_id)
+        entry = json.dumps({"expires_at": time.time() + ttl, "value": value})
+        pipeline = self._client.pipeline()
+        pipeline.hset(key, field, entry)
+        pipeline.expire(key, max(int(ttl), 1))
+        pipeline.execute()
+
+    def delete(self, user_id: int):
+        self._client.delete(self._key(user_id))
+
+
+def create_backend(url: str = RECOMMENDATION_CACHE_URL) -> CacheBackend:
+    if url:
+        return RedisCacheBackend(url)
+    return LocalCacheBackend()
+
+
+class RecommendationCache:
+    """Cache de listas de recomendação por (usuário, escopo, versão do modelo), invalidado pelos votos do usuário.
+
+    Falhas do backend nunca derrubam a requisição: contam como miss e a lista é recalculada.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: float = RECOMMENDATION_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+        self.last_error = None
+
+    def get_or_compute(self, user_id: int, scope: str, model_version, compute):
+        field = f"{scope}:{model_version}"
+        try:
+            cached = self.backend.get(user_id, field)
+        except Exception as e:
+            self._record_error(e)
+            cached = None
+
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        value = compute()
+        try:
+            self.backend.set(user_id, field, value, self.ttl_seconds)
+        except Exception as e:
+            self._record_error(e)
+        return value
+
+    def invalidate(self, user_id: int):
+        try:
+            self.backend.delete(user_id)
+            self.invalidations += 1
+        except Exception as e:
+            self._record_error(e)
+
+    def _record_error(self, error: Exception):
+        self.errors += 1
+        self.last_error = str(error)
+        print(f"⚠️ Cache de recomendações indisponível: {error}")
+
+    def status(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend) if isinstance(self.backend, LocalCacheBackend) else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            "ttl_seconds": self.ttl_seconds,
+            "last_error": self.last_error,
+        }
+
+
+recommendation_cache = RecommendationCache(create_backend())
@@ -0,0 +1,165 @@
+import bisect
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import models
+from services.genre_service import genre_catalog, mask_from_names
+
+SEARCH_INDEX_CHECK_SECONDS = int(os.getenv("SEARCH_INDEX_CHECK_SECONDS", "30"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_GENRE_SEPARATORS = re.compile(r"[|,]")
+
+
+def normalize(text: str) -> str:
+    """Remove acentos e converte para minúsculas."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text: str):
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def parse_genres(genres: str):
+    """Converte `Action|Sci-Fi` (ou `action,sci-fi`) em um conjunto de gêneros normalizados."""
+    return frozenset(g.strip() for g in _GENRE_SEPARATORS.split(normalize(genres)) if g.strip())
+
+
+class _Snapshot:
+    __slots__ = ("postings", "vocabulary", "titles", "genre_masks", "genre_bits", "years", "ids")
+
+    def __init__(self):
+        self.postings = {}
+        self.vocabulary = []
+        self.titles = {}
+        self.genre_masks = {}
+        self.genre_bits = {}
+        self.years = {}
+        self.ids = []
+
+
+class MovieSearchIndex:
+    """Índice invertido em memória de títulos e gêneros, com busca por prefixo e ranking."""
+
+    def __init__(self, check_interval: int = SEARCH_INDEX_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    def _current_signature(self, db: Session):
+        return tuple(db.query(func.count(models.Movie.id), func.max(models.Movie.id)).one())
+
+    def build(self, db: Session):
+        signature = self._current_signature(db)
+        rows = db.query(models.Movie.id, models.Movie.title, models.Movie.year, models.Movie.genre_mask).all()
+
+        snapshot = _Snapshot()
+        genre_catalog.invalidate()
+        snapshot.genre_bits = genre_catalog.bits(db)
+        for movie_id, title, year, genre_mask in rows:
+            snapshot.titles[movie_id] = normalize(title)
+            snapshot.genre_masks[movie_id] = genre_mask or 0
+            snapshot.years[movie_id] = year
+            for token in set(tokenize(title)):
+                snapshot.postings.setdefault(token, set()).add(movie_id)
+
+        snapshot.vocabulary = sorted(snapshot.postings)
+        snapshot.ids = sorted(snapshot.titles)
+
+        with self._lock:
+            self._snapshot = snapshot
+            self._signature = signature
+            self._checked_at = time.monotonic()
+
+        print(f"🔎 Índice de busca construído com {len(rows)} filmes e {len(snapshot.vocabulary)} termos.")
+
+    def refresh_if_changed(self, db: Session):
+        """Reconstrói o índice quando a tabela de filmes muda (verificado no máximo a cada `check_interval`)."""
+        if self._snapshot is None:
+            self.build(db)
+            return
+
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+
+        self._checked_at = time.monotonic()
+        if self._current_signature(db) != self._signature:
+            self.build(db)
+
+    def invalidate(self):
+        self._checked_at = 0.0
+        self._signature = None
+
+    def _expand(self, snapshot: _Snapshot, token: str):
+        """Retorna {movie_id: peso} para um termo: 2 para correspondência exata, 1 para prefixo."""
+        matches = {}
+        start = bisect.bisect_left(snapshot.vocabulary, token)
+        for candidate in snapshot.vocabulary[start:]:
+            if not candidate.startswith(token):
+                break
+            weight = 2.0 if candidate == token else 1.0
+            for movie_id in snapshot.postings[candidate]:
+                if matches.get(movie_id, 0.0) < weight:
+                    matches[movie_id] = weight
+        return matches
+
+    def search(self, title: str = None, genres: str = None, year: int = None):
+        """Retorna os IDs dos filmes que atendem aos filtros, ordenados por relevância."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return []
+
+        if title:
+            tokens = tokenize(title)
+            if not tokens:
+                return []
+
+            scores = None
+            for token in tokens:
+                matches = self._expand(snapshot, token)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {movie_id: score + matches[movie_id] for movie_id, score in scores.items() if movie_id in matches}
+                if not scores:
+                    return []
+
+            phrase = " ".join(tokens)
+            for movie_id in scores:
+                normalized_title = " ".join(_TOKEN_RE.findall(snapshot.titles[movie_id]))
+                if normalized_title.startswith(phrase):
+                    scores[movie_id] += 1.0
+                elif phrase in normalized_title:
+                    scores[movie_id] += 0.5
+            candidates = list(scores)
+        else:
+            scores = {}
+            candidates = snapshot.ids
+
+        if genres:
+            required_mask = mask_from_names(parse_genres(genres), snapshot.genre_bits)
+            if required_mask is None:
+                return []
+            candidates = [m for m in candidates if snapshot.genre_masks[m] & required_mask == required_mask]
+        if year:
+            candidates = [m for m in candidates if snapshot.years[m] == year]
+
+        if title:
+            candidates.sort(key=lambda m: (-scores[m], len(snapshot.titles[m]), m))
+        return candidates
+
+
+movie_search_index = MovieSearchIndex()
@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import models
+from services.genre_service import MAX_GENRES, genre_idf, load_genre_features, tfidf_weight
+from services.metrics import recommender_inference_seconds, recommender_train_seconds
+
+SIMILARITY_TOP_K = int(os.getenv("SIMILARITY_TOP_K", "20"))
+SIMILARITY_BLOCK_SIZE = int(os.getenv("SIMILARITY_BLOCK_SIZE", "512"))
+SIMILARITY_INDEX_PATH = os.getenv("SIMILARITY_INDEX_PATH")
+SIMILARITY_CHECK_SECONDS = int(os.getenv("SIMILARITY_CHECK_SECONDS", "30"))
+
+
+def top_k(scores, indices, k: int):
+    """Top-K por linha com argpartition, ordenado por score desc e índice asc (desempate estável)."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int32), np.empty((scores.shape[0], 0), dtype=np.float32)
+
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    part_indices = np.take_along_axis(indices, part, axis=1)
+
+    order = np.lexsort((part_indices, -part_scores), axis=1)
+    return np.take_along_axis(part_indices, order, axis=1).astype(np.int32), np.take_along_axis(part_scores, order, axis=1).astype(np.float32)
+
+
+class _SimilarityState:
+    __slots__ = ("movie_ids", "features", "idf", "neighbors", "scores", "row_of")
+
+    def __init__(self, movie_ids, features, idf, neighbors, scores):
+        self.movie_ids = movie_ids
+        self.features = features
+        self.idf = idf
+        self.neighbors = neighbors
+        self.scores = scores
+        self.row_of = {int(movie_id): row for row, movie_id in enumerate(movie_ids)}
+
+
+class ItemSimilarityIndex:
+    """Tabela de K vizinhos mais similares (cosseno sobre gêneros TF-IDF) por filme, mantida em memória.
+
+    Os arrays ficam num único `_SimilarityState`, trocado por inteiro a cada atualização: leitores pegam uma
+    referência e nunca misturam linhas de um índice com ids de outro.
+    """
+
+    def __init__(self, k: int = SIMILARITY_TOP_K, block_size: int = SIMILARITY_BLOCK_SIZE, path: str = SIMILARITY_INDEX_PATH):
+        self.k = k
+        self.block_size = block_size
+        self.path = path
+        self._state = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._state is not None
+
+    @property
+    def movie_ids(self):
+        state = self._state
+        return state.movie_ids if state is not None else np.empty(0, dtype=np.int64)
+
+    def _neighbors_for(self, rows, features):
+        """Calcula o top-K de `rows` contra todos os filmes do índice, em blocos para limitar a memória."""
+        all_indices = np.arange(features.shape[0], dtype=np.int32)
+        neighbors, scores = [], []
+        for start in range(0, len(rows), self.block_size):
+            block_rows = rows[start:start + self.block_size]
+            similarity = features[block_rows] @ features.T
+            similarity[np.arange(len(block_rows)), block_rows] = -np.inf
+            block_neighbors, block_scores = top_k(similarity, np.broadcast_to(all_indices, similarity.shape), self.k)
+            neighbors.append(block_neighbors)
+            scores.append(block_scores)
+        if not neighbors:
+            return np.empty((0, self.k), dtype=np.int32), np.empty((0, self.k), dtype=np.float32)
+        return np.vstack(neighbors), np.vstack(scores)
+
+    def build(self, db: Session):
+        with recommender_train_seconds.time(model="similarity"):
+            ids, _, _, raw_features = load_genre_features(db, n_bits=MAX_GENRES)
+            idf = genre_idf(raw_features)
+            features = tfidf_weight(raw_features, idf)
+            neighbors, scores = self._neighbors_for(np.arange(len(ids)), features)
+
+        with self._lock:
+            self._swap(ids, features, idf, neighbors, scores)
+
+        print(f"🧭 Índice de similaridade construído para {len(ids)} filmes (K={self.k}).")
+        self.save()
+
+    def _swap(self, ids, features, idf, neighbors, scores):
+        self._state = _SimilarityState(ids, features, idf, neighbors, scores)
+
+    def add_movies(self, db: Session, movie_ids):
+        """Insere novos filmes reaproveitando o IDF atual e atualiza só os vizinhos afetados."""
+        ids, _, _, raw_features = load_genre_features(db, movie_ids=movie_ids, n_bits=MAX_GENRES)
+        if not len(ids):
+            return
+
+        if len(self.movie_ids) <= self.k:
+            self.build(db)
+            return
+
+        with self._lock:
+            state = self._state
+            n_old = len(state.movie_ids)
+            features = np.vstack([state.features, tfidf_weight(raw_features, state.idf)])
+            new_rows = np.arange(n_old, n_old + len(ids))
+            new_neighbors, new_scores = self._neighbors_for(new_rows, features)
+
+            # Vizinhos antigos: mescla o top-K atual com a similaridade contra os filmes novos.
+            cross = state.features @ features[new_rows].T
+            merged_scores = np.hstack([state.scores, cross])
+            merged_indices = np.hstack([state.neighbors, np.broadcast_to(new_rows.astype(np.int32), cross.shape)])
+            old_neighbors, old_scores = top_k(merged_scores, merged_indices, self.k)
+
+            self._swap(
+                np.concatenate([state.movie_ids, ids]),
+                features,
+                state.idf,
+                np.vstack([old_neighbors, new_neighbors]),
+                np.vstack([old_scores, new_scores]),
+            )
+
+        print(f"🧭 {len(ids)} filmes adicionados ao índice de similaridade.")
+        self.save()
+
+    def refresh_if_changed(self, db: Session):
+        """Constrói o índice na primeira chamada e incorpora filmes novos; remoções forçam reconstrução."""
+        if not self.ready:
+            if not self.load():
+                self.build(db)
+            return
+
+        if time.monotonic() - self._checked_at < SIMILARITY_CHECK_SECONDS:
+            return
+        self._checked_at = time.monotonic()
+
+        indexed_ids = self.movie_ids
+        count, max_id = db.query(func.count(models.Movie.id), func.max(models.Movie.id)).one()
+        if count == len(indexed_ids) and (max_id or 0) == (int(indexed_ids.max()) if count else 0):
+            return
+
+        current_ids = np.array([row.id for row in db.query(models.Movie.id).all()], dtype=np.int64)
+        if np.setdiff1d(indexed_ids, current_ids, assume_unique=True).size:
+            self.build(db)
+        else:
+            self.add_movies(db, np.setdiff1d(current_ids, indexed_ids, assume_unique=True).tolist())
+
+    def similar_to(self, movie_id: int, n: int = 5):
+        """Retorna [(movie_id, score)] dos `n` filmes mais similares, ou None se o filme não estiver indexado."""
+        with recommender_inference_seconds.time(model="similarity"):
+            state = self._state
+            row = state.row_of.get(movie_id) if state is not None else None
+            if row is None:
+                return None
+            valid = np.isfinite(state.scores[row])
+            neighbor_rows = state.neighbors[row][valid][:n]
+            return list(zip(state.movie_ids[neighbor_rows].tolist(), state.scores[row][valid][:n].tolist()))
+
+    def save(self):
+        state = self._state
+        if not self.path or state is None:
+            return
+        with self._lock, open(self.path, "wb") as file:
+            np.savez(
+                file,
+                movie_ids=state.movie_ids,
+                features=state.features,
+                idf=state.idf,
+                neighbors=state.neighbors,
+                scores=state.scores,
+            )
+
+    def load(self) -> bool:
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with np.load(self.path) as data:
+            if data["neighbors"].shape[1] != self.k:
+                return False
+            with self._lock:
+                self._swap(data["movie_ids"], data["features"], data["idf"], data["neighbors"], data["scores"])
+        print(f"🧭 Índice de similaridade carregado de {self.path} ({len(self.movie_ids)} filmes).")
+        return True
+
+
+movie_similarity_index = ItemSimilarityIndex()
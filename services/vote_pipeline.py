@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from sqlalchemy.exc import IntegrityError
+
+from app import models
+from app.database import SessionLocal
+from services.bulk_loader import upsert_statement
+from services.popularity_service import popularity_ranking
+from services.rating_events import rating_event_log
+from services.recommendation_cache import recommendation_cache
+
+VOTE_BATCH_MAX = int(os.getenv("VOTE_BATCH_MAX", "500"))
+VOTE_FLUSH_MS = float(os.getenv("VOTE_FLUSH_MS", "5"))
+VOTE_QUEUE_MAX = int(os.getenv("VOTE_QUEUE_MAX", "100000"))
+
+CREATED, UPDATED, UNCHANGED = "created", "updated", "unchanged"
+
+
+class VoteQueueFull(Exception):
+    """A fila de votos atingiu o limite; o cliente deve tentar mais tarde."""
+
+
+class UnknownVoteTarget(Exception):
+    """O usuário ou o filme do voto não existe (a gravação violou uma FK)."""
+
+    def __init__(self, user_id: int, movie_id: int):
+        super().__init__(f"Usuário {user_id} ou filme {movie_id} não encontrado.")
+        self.user_id = user_id
+        self.movie_id = movie_id
+
+
+class Vote:
+    __slots__ = ("user_id", "movie_id", "rating", "future")
+
+    def __init__(self, user_id: int, movie_id: int, rating: float):
+        self.user_id = user_id
+        self.movie_id = movie_id
+        self.rating = rating
+        self.future = Future()
+
+
+class VotePipeline:
+    """Write-behind dos votos: as requisições enfileiram e uma thread grava em lote (group commit).
+
+    Um lote é gravado quando junta `batch_max` votos ou `flush_ms` depois do primeiro voto pendente, em uma
+    única transação: upsert em ratings pela chave única (user_id, movie_id) e um UPDATE por filme nos
+    agregados. Cada voto tem um Future resolvido com "created", "updated" ou "unchanged" após o commit, ou
+    com a exceção se o próprio voto não puder ser gravado (UnknownVoteTarget para usuário ou filme inexistente).
+    """
+
+    def __init__(self, batch_max: int = VOTE_BATCH_MAX, flush_ms: float = VOTE_FLUSH_MS, queue_max: int = VOTE_QUEUE_MAX):
+        self.batch_max = batch_max
+        self.flush_ms = flush_ms
+        self.queue_max = queue_max
+        self.enqueued = 0
+        self.committed = 0
+        self.batches = 0
+        self.rejected = 0
+        self.failed = 0
+        self.last_error = None
+        self._votes = deque()
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def submit(self, user_id: int, movie_id: int, rating: float) -> Future:
+        self.start()
+        vote = Vote(int(user_id), int(movie_id), float(rating))
+        with self._condition:
+            if len(self._votes) >= self.queue_max:
+                self.rejected += 1
+                raise VoteQueueFull()
+            self._votes.append(vote)
+            self.enqueued += 1
+            if len(self._votes) >= self.batch_max:
+                self._condition.notify()
+            elif len(self._votes) == 1:
+                self._condition.notify()
+        return vote.future
+
+    def _next_batch(self):
+        """Espera o primeiro voto e então até `flush_ms` (ou `batch_max` votos) para fechar o lote."""
+        with self._condition:
+            while not self._votes and not self._stop.is_set():
+                self._condition.wait()
+            deadline = time.monotonic() + self.flush_ms / 1000
+            while len(self._votes) < self.batch_max and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return [self._votes.popleft() for _ in range(min(len(self._votes), self.batch_max))]
+
+    def flush(self, votes):
+        """Grava um lote e resolve os Futures; retorna {(user_id, movie_id): resultado} dos votos gravados.
+
+        Se a transação do lote falhar (ex.: FK de um usuário ou filme inexistente), regrava par a par para que
+        só os votos inválidos recebam a exceção.
+        """
+        try:
+            outcomes = self._write(votes)
+        except Exception as e:
+            self.last_error = str(e)
+            by_pair = {}
+            for vote in votes:
+                by_pair.setdefault((vote.user_id, vote.movie_id), []).append(vote)
+            if len(by_pair) == 1:
+                self._fail(votes, e)
+                raise
+            outcomes = {}
+            for (user_id, movie_id), pair_votes in by_pair.items():
+                try:
+                    outcomes.update(self._write(pair_votes))
+                except Exception as error:
+                    print(f"❌ Voto de {user_id} no filme {movie_id} rejeitado: {error}")
+                    self.last_error = str(error)
+                    self._fail(pair_votes, error)
+
+        written = [vote for vote in votes if (vote.user_id, vote.movie_id) in outcomes]
+        self.committed += len(written)
+        self.batches += 1
+        latest = {}
+        for vote in written:
+            latest[(vote.user_id, vote.movie_id)] = vote.rating
+            vote.future.set_result(outcomes[(vote.user_id, vote.movie_id)])
+        self._after_commit(latest, outcomes)
+        return outcomes
+
+    def _fail(self, votes, error):
+        """Resolve os Futures de um único par com o erro; violações de FK viram UnknownVoteTarget."""
+        if isinstance(error, IntegrityError):
+            cause, error = error, UnknownVoteTarget(votes[0].user_id, votes[0].movie_id)
+            error.__cause__ = cause
+        self.failed += len(votes)
+        for vote in votes:
+            vote.future.set_exception(error)
+
+    def _write(self, votes):
+        """Uma transação: upsert dos votos (o último de cada par vale) e Δ dos agregados dos filmes."""
+        latest = {}
+        for vote in votes:
+            latest[(vote.user_id, vote.movie_id)] = vote.rating
+
+        db = SessionLocal()
+        try:
+            rows = db.execute(models.existing_votes_query(latest).with_for_update()).all()
+            previous = {(row.user_id, row.movie_id): float(row.rating) for row in rows}
+
+            outcomes, records, deltas = {}, [], {}
+            for (user_id, movie_id), rating in latest.items():
+                old = previous.get((user_id, movie_id))
+                if old == rating:
+                    outcomes[(user_id, movie_id)] = UNCHANGED
+                    continue
+                count_delta, sum_delta = deltas.get(movie_id, (0, 0.0))
+                if old is None:
+                    deltas[movie_id] = (count_delta + 1, sum_delta + rating)
+                    outcomes[(user_id, movie_id)] = CREATED
+                else:
+                    deltas[movie_id] = (count_delta, sum_delta + rating - old)
+                    outcomes[(user_id, movie_id)] = UPDATED
+                records.append({"user_id": user_id, "movie_id": movie_id, "rating": rating})
+
+            if records:
+                connection = db.connection()
+                statement = upsert_statement(models.Rating.__table__, connection.dialect.name, ["user_id", "movie_id"], ["rating", "timestamp"])
+                connection.execute(statement, records)
+                models.apply_rating_deltas(db, deltas)
+            db.commit()
+            return outcomes
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+            SessionLocal.remove()
+
+    def _after_commit(self, latest, outcomes):
+        for (user_id, movie_id), rating in latest.items():
+            if outcomes[(user_id, movie_id)] == UNCHANGED:
+                continue
+            popularity_ranking.note_vote()
+            rating_event_log.append(user_id, movie_id, rating)
+            recommendation_cache.invalidate(user_id)
+
+    def _run(self):
+        while True:
+            votes = self._next_batch()
+            if not votes:
+                if self._stop.is_set():
+                    return
+                continue
+            try:
+                self.flush(votes)
+            except Exception as e:
+                print(f"❌ Erro ao gravar lote de {len(votes)} votos: {e}")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vote-pipeline", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Para a thread depois de gravar os votos ainda na fila."""
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self):
+        return {
+            "pending": len(self._votes),
+            "enqueued": self.enqueued,
+            "committed": self.committed,
+            "batches": self.batches,
+            "avg_batch_size": round(self.committed / self.batches, 2) if self.batches else None,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "batch_max": self.batch_max,
+            "flush_ms": self.flush_ms,
+            "last_error": self.last_error,
+        }
+
+
+vote_pipeline = VotePipeline()
@@ -0,0 +1,32 @@
+"""Retomada da carga em blocos, em SQLite em memória."""
+import pandas as pd
+from sqlalchemy import Column, Index, Integer, MetaData, Table, create_engine, inspect
+from sqlalchemy.pool import StaticPool
+
+from services.bulk_loader import ChunkedLoader, deferrable_indexes
+
+metadata = MetaData()
+events = Table(
+    "events",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("kind", Integer, nullable=False),
+    Index("ix_events_kind", "kind"),
+)
+
+
+def test_resume_after_last_chunk_recreates_deferred_indexes():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    metadata.create_all(engine)
+    loader = ChunkedLoader(engine, chunk_size=2)
+    frame = pd.DataFrame({"id": [1, 2, 3], "kind": [1, 1, 2]})
+    assert [index.name for index in deferrable_indexes(events)] == ["ix_events_kind"]
+
+    # Simula uma queda depois do commit do último bloco e antes da recriação dos índices.
+    loader.load(events, frame)
+    with engine.begin() as conn:
+        next(iter(events.indexes)).drop(conn)
+    assert "ix_events_kind" not in {index["name"] for index in inspect(engine).get_indexes("events")}
+
+    assert loader.load(events, frame) == 0
+    assert "ix_events_kind" in {index["name"] for index in inspect(engine).get_indexes("events")}
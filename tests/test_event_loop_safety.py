@@ -0,0 +1,88 @@
+"""Serviços chamados via `AsyncSession.run_sync` rodam em greenlets no event loop e não podem esperar por locks.
+
+A sessão falsa cede o loop em cada consulta, como o driver assíncrono faz; se um serviço bloquear num lock
+enquanto outra requisição está no meio da consulta, o loop trava e a thread do teste não termina.
+"""
+import asyncio
+import threading
+from decimal import Decimal
+
+from sqlalchemy.util import await_only, greenlet_spawn
+
+from services.genre_service import GenreCatalog
+from services.popularity_service import PopularityRanking
+
+CONCURRENT_REQUESTS = 5
+TIMEOUT_SECONDS = 5
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *criteria):
+        return self
+
+    def order_by(self, *clauses):
+        return self
+
+    def all(self):
+        await_only(asyncio.sleep(0.05))
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def query(self, *entities):
+        self.queries += 1
+        return FakeQuery(self.rows)
+
+
+def run_concurrently(function, *args):
+    """Roda `function` em greenlets concorrentes num loop próprio; retorna os resultados ou None se travar."""
+    results = []
+
+    async def main():
+        results.extend(await asyncio.gather(*(greenlet_spawn(function, *args) for _ in range(CONCURRENT_REQUESTS))))
+
+    thread = threading.Thread(target=asyncio.run, args=(main(),), daemon=True)
+    thread.start()
+    thread.join(TIMEOUT_SECONDS)
+    return None if thread.is_alive() else results
+
+
+def test_popularity_first_build_does_not_block_the_loop():
+    db = FakeSession([(1, 10, Decimal("4.5")), (2, 3, Decimal("3.0"))])
+    ranking = PopularityRanking()
+
+    pages = run_concurrently(ranking.page, db)
+
+    assert pages is not None, "event loop travou esperando o lock do ranking"
+    assert all(page == db.rows for page in pages)
+    assert ranking.status()["size"] == 2
+
+
+def test_popularity_stale_rebuild_serves_current_ranking():
+    db = FakeSession([(1, 10, Decimal("4.5"))])
+    ranking = PopularityRanking(refresh_seconds=0, max_staleness_seconds=3600)
+    run_concurrently(ranking.page, db)
+    db.queries = 0
+
+    pages = run_concurrently(ranking.page, db)
+
+    assert pages is not None
+    # Só quem pegou o lock reconstrói; as demais serviram o ranking existente sem consultar.
+    assert db.queries == 1
+
+
+def test_genre_catalog_load_does_not_block_the_loop():
+    db = FakeSession([("Action", 0), ("Sci-Fi", 14)])
+    catalog = GenreCatalog()
+
+    loaded = run_concurrently(catalog.bits, db)
+
+    assert loaded is not None, "event loop travou esperando o lock do catálogo de gêneros"
+    assert all(bits == {"action": 0, "sci-fi": 14} for bits in loaded)
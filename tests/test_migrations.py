@@ -0,0 +1,89 @@
+"""Upgrade de um banco criado pelo ETL antigo (esquema anterior às migrações), sempre em SQLite em memória."""
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import DECIMAL, Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text, create_engine, inspect, select
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.migrations import index_names, upgrade
+
+# Tabelas como o ETL original as criava: sem agregados, sem genre_mask, sem tabelas de gêneros e sem unicidade.
+legacy_metadata = MetaData()
+Table(
+    "movies", legacy_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("title", String(255), nullable=False, index=True),
+    Column("year", Integer),
+    Column("genres", String(255)),
+    Column("image_base64", Text),
+)
+Table(
+    "users", legacy_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("username", String(255), unique=True),
+    Column("password_hash", String(255)),
+    Column("gender", String(10), nullable=False),
+    Column("age", Integer, nullable=False),
+    Column("occupation", Integer, nullable=False),
+    Column("zip_code", String(20), nullable=False),
+)
+Table(
+    "ratings", legacy_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("movie_id", Integer, ForeignKey("movies.id", ondelete="CASCADE"), nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE")),
+    Column("rating", DECIMAL(3, 2), nullable=False),
+    Column("timestamp", DateTime, nullable=False),
+)
+
+
+@pytest.fixture
+def legacy_engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    legacy_metadata.create_all(engine)
+    tables = legacy_metadata.tables
+    with engine.begin() as connection:
+        connection.execute(tables["movies"].insert(), [
+            {"id": 1, "title": "Toy Story", "year": 1995, "genres": "Animation|Children's|Comedy"},
+            {"id": 2, "title": "Heat", "year": 1995, "genres": "Action|Crime|Thriller"},
+        ])
+        connection.execute(tables["users"].insert(), [
+            {"id": user_id, "gender": "F", "age": 25, "occupation": 0, "zip_code": "00000"} for user_id in (1, 2)
+        ])
+        connection.execute(tables["ratings"].insert(), [
+            {"movie_id": 1, "user_id": 1, "rating": 3, "timestamp": datetime(2000, 1, 1)},
+            # Voto repetido do ETL antigo: a 0002 mantém só o mais recente (rating 5).
+            {"movie_id": 1, "user_id": 1, "rating": 5, "timestamp": datetime(2000, 1, 2)},
+            {"movie_id": 1, "user_id": 2, "rating": 4, "timestamp": datetime(2000, 1, 3)},
+            {"movie_id": 2, "user_id": 2, "rating": 2, "timestamp": datetime(2000, 1, 4)},
+        ])
+    yield engine
+    engine.dispose()
+
+
+def test_upgrade_legacy_database(legacy_engine):
+    applied = upgrade(legacy_engine)
+
+    assert "0001.1" in applied
+    columns = {column["name"] for column in inspect(legacy_engine).get_columns("movies")}
+    assert {"genre_mask", "rating_count", "rating_sum", "avg_rating"} <= columns
+    assert "token_version" in {column["name"] for column in inspect(legacy_engine).get_columns("users")}
+
+    movies = models.Movie.__table__
+    with legacy_engine.connect() as connection:
+        assert "ux_ratings_user_movie" in index_names(connection, "ratings")
+        stats = {row.id: row for row in connection.execute(
+            select(movies.c.id, movies.c.rating_count, movies.c.rating_sum, movies.c.avg_rating, movies.c.genre_mask)
+        )}
+        genre_bits = dict(connection.execute(select(models.Genre.name, models.Genre.bit)).all())
+        memberships = connection.execute(select(models.movie_genres)).all()
+
+    assert (stats[1].rating_count, stats[1].rating_sum, stats[1].avg_rating) == (2, Decimal("9.00"), Decimal("4.50"))
+    assert (stats[2].rating_count, stats[2].avg_rating) == (1, Decimal("2.00"))
+    expected_mask = sum(1 << genre_bits[name] for name in ("Animation", "Children's", "Comedy"))
+    assert stats[1].genre_mask == expected_mask
+    assert len(memberships) == 6
+
+    assert upgrade(legacy_engine) == []
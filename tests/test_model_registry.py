@@ -0,0 +1,38 @@
+"""Pedidos de retreino do ModelRegistry: agrupamento durante o treino e intervalo mínimo."""
+import threading
+import time
+
+from services.model_registry import ModelRegistry
+
+
+def wait_until(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_requests_during_training_merge_into_one_retrain():
+    release = threading.Event()
+    trainings = []
+
+    def train(db):
+        trainings.append(time.monotonic())
+        release.wait(5)
+        return object(), 1
+
+    registry = ModelRegistry("test", train, retrain_seconds=3600, min_retrain_seconds=60)
+    registry.start()
+    try:
+        assert wait_until(lambda: registry.training)
+        assert registry.request_retrain() is True
+        assert [registry.request_retrain() for _ in range(5)] == [False] * 5
+        assert registry.retry_after() > 0
+
+        release.set()
+        assert wait_until(lambda: len(trainings) == 2 and not registry.training)
+        time.sleep(0.1)
+        assert len(trainings) == 2
+        assert registry.retrain_pending is False
+    finally:
+        registry.stop()
@@ -0,0 +1,23 @@
+"""Tamanhos pequenos do gerador sintético (os usados em execuções rápidas de fumaça)."""
+import pytest
+
+from benchmarks.synthetic_dataset import MIN_RATINGS_PER_USER, dataset_shape, generate, parse_size
+from services.movielens_reader import read_movielens
+
+
+@pytest.mark.parametrize("size", ["1K", "50K"])
+def test_small_sizes_generate_unique_pairs(tmp_path, size):
+    n_ratings = parse_size(size)
+    n_users, n_movies = dataset_shape(n_ratings)
+
+    assert generate(n_ratings, str(tmp_path), seed=1) == (n_users, n_movies, n_ratings)
+
+    movies, users, ratings = read_movielens(str(tmp_path))
+    assert (len(movies), len(users), len(ratings)) == (n_movies, n_users, n_ratings)
+    assert not ratings.duplicated(["user_id", "movie_id"]).any()
+    assert ratings.groupby("user_id").size().min() >= MIN_RATINGS_PER_USER
+
+
+def test_too_small_size_is_rejected():
+    with pytest.raises(ValueError, match="pelo menos"):
+        dataset_shape(500)
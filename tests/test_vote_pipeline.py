@@ -0,0 +1,66 @@
+"""Gravação em lote do pipeline de votos, em SQLite em memória com FKs ligadas."""
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+pytest.importorskip("scipy")
+
+from app import models
+from app.migrations import upgrade
+from services import vote_pipeline as pipeline_module
+from services.vote_pipeline import CREATED, UnknownVoteTarget, Vote, VotePipeline
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", lambda connection, _: connection.execute("PRAGMA foreign_keys = ON"))
+    upgrade(engine)
+    with engine.begin() as connection:
+        connection.execute(models.Movie.__table__.insert(), [
+            {"id": movie_id, "title": f"Movie {movie_id}", "genres": "Drama"} for movie_id in (1, 2)
+        ])
+        connection.execute(models.User.__table__.insert(), [
+            {"id": 1, "gender": "F", "age": 25, "occupation": 0, "zip_code": "00000"}
+        ])
+    monkeypatch.setattr(pipeline_module, "SessionLocal", scoped_session(sessionmaker(bind=engine)))
+    yield engine
+    engine.dispose()
+
+
+def test_invalid_vote_fails_alone(engine):
+    pipeline = VotePipeline()
+    votes = [Vote(1, 1, 5), Vote(1, 999, 5), Vote(1, 2, 0)]
+
+    outcomes = pipeline.flush(votes)
+
+    assert outcomes == {(1, 1): CREATED, (1, 2): CREATED}
+    assert [votes[0].future.result(), votes[2].future.result()] == [CREATED, CREATED]
+    with pytest.raises(UnknownVoteTarget):
+        votes[1].future.result()
+    assert (pipeline.committed, pipeline.failed) == (2, 1)
+
+    movies = models.Movie.__table__
+    with engine.connect() as connection:
+        stored = connection.execute(select(models.Rating.movie_id).order_by(models.Rating.movie_id)).scalars().all()
+        stats = dict(connection.execute(select(movies.c.id, movies.c.rating_sum)).all())
+    assert stored == [1, 2]
+    assert stats == {1: Decimal("5.00"), 2: Decimal("0.00")}
+
+
+@pytest.mark.parametrize("user_id, movie_id", [(1, 999), (999, 1)])
+def test_vote_for_unknown_user_or_movie_fails_with_unknown_target(engine, user_id, movie_id):
+    pipeline = VotePipeline()
+    vote = Vote(user_id, movie_id, 5)
+
+    with pytest.raises(IntegrityError):
+        pipeline.flush([vote])
+
+    # O router traduz UnknownVoteTarget em 404 em vez de um 500 genérico.
+    with pytest.raises(UnknownVoteTarget) as raised:
+        vote.future.result()
+    assert (raised.value.user_id, raised.value.movie_id) == (user_id, movie_id)